@@ -0,0 +1,13 @@
+# chess [ai] engine
+# Headless chess rules, move generation and AI search; no pygame required
+
+from engine.position import Position, squareIndex, squareName
+from engine.movegen import getLegalMoves, getPseudoLegalMoves, getLegalTargets, \
+     moveToUci
+from engine.tt import TranspositionTable
+from engine.ordering import MoveOrderer
+from engine.evaluate import evaluate
+from engine.game import ChessPiece, GameState
+from engine.search import MinimaxAgent
+from engine.parallel import ParallelAgent
+from engine.tablebase import Tablebase
@@ -0,0 +1,175 @@
+# chess [ai] engine
+# Search benchmark: fixed positions searched to a fixed depth
+# python -m engine.bench [--depth N] [--workers N] [--without TECHNIQUE] [--pruning-report]
+#                        [--json] [--baseline FILE]
+
+import argparse
+import io
+import json
+import sys
+import time
+from engine.position import Position, COLOR_NAMES, START_FEN, moveToUci
+from engine.search import MinimaxAgent
+from engine.parallel import ParallelAgent
+
+BENCH_DEPTH   = 4
+BENCH_HASH_MB = 16
+BENCH_SEED    = 15112
+
+# Openings, middlegames and endgames, including the perft positions
+BENCH_POSITIONS = [
+    ("start position", START_FEN),
+    ("italian", "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("queen's gambit", "rnbqkb1r/ppp2ppp/4pn2/3p4/2PP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4"),
+    ("black to move", "r1bq1rk1/ppp2ppp/2np1n2/2b1p3/2B1P3/2NP1N2/PPP2PPP/R1BQ1RK1 b - - 1 7"),
+    ("rook endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("pawn endgame", "8/5k2/3p4/1p1P4/1P3K2/8/8/8 w - - 0 1")]
+
+# Selective search techniques by command line name, and the agent switch for each
+PRUNING_SWITCHES = {"null-move": "nullMove", "lmr": "lateMoveReductions", "futility": "futility"}
+
+def benchPosition(name, fen, depth, hashSizeMb=BENCH_HASH_MB, workers=1, without=()):
+    # Each position gets a fresh agent so results do not depend on the order
+    position = Position.fromFen(fen)
+    color = COLOR_NAMES[position.sideToMove]
+    if workers > 1:
+        agent = ParallelAgent(depth, color, hashSizeMb, seed=BENCH_SEED, workers=workers)
+    else:
+        agent = MinimaxAgent(depth, color, hashSizeMb, seed=BENCH_SEED)
+    for technique in without:
+        setattr(agent, PRUNING_SWITCHES[technique], False)
+    # Starting the worker processes is not part of the search time
+    if workers > 1: agent.startPool()
+    depthTimes = list()
+    scores = list()
+    def recordDepth(depthDone, score, pv):
+        depthTimes.append(round(time.time() - agent.startTime, 4))
+        scores.append(score)
+    startTime = time.time()
+    bestMove = agent.search(position, maxDepth=depth, report=recordDepth)
+    seconds = time.time() - startTime
+    if workers > 1: agent.close()
+    return {"name": name, "fen": fen, "depth": depth, "nodes": agent.nodes,
+            "seconds": round(seconds, 4), "nps": int(agent.nodes / max(seconds, 1e-6)),
+            "bestMove": moveToUci(bestMove), "score": scores[-1] if scores else None,
+            "pv": [moveToUci(move) for move in agent.principalVariation],
+            "depthTimes": depthTimes}
+
+def runBench(depth=BENCH_DEPTH, hashSizeMb=BENCH_HASH_MB, workers=1, without=()):
+    results = [benchPosition(name, fen, depth, hashSizeMb, workers, without)
+               for name, fen in BENCH_POSITIONS]
+    nodes = sum(result["nodes"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+    return {"depth": depth, "hashMb": hashSizeMb, "workers": workers, "without": list(without),
+            "nodes": nodes, "seconds": round(seconds, 4),
+            "nps": int(nodes / max(seconds, 1e-6)), "positions": results}
+
+def printBench(bench, output=sys.stdout):
+    for result in bench["positions"]:
+        depthTimes = " ".join(f"{seconds:.2f}" for seconds in result["depthTimes"])
+        output.write(f"{result['name']:<15} nodes {result['nodes']:>8} "
+                     f"time {result['seconds']:6.2f}s nps {result['nps']:>7} "
+                     f"best {result['bestMove']:<5} depth times {depthTimes}\n"
+                     f"{'':<15} pv {' '.join(result['pv'])}\n")
+    output.write(f"\ndepth {bench['depth']} nodes {bench['nodes']} time {bench['seconds']:.2f}s "
+                 f"nps {bench['nps']}\n")
+
+def compareBench(bench, baseline, output=sys.stdout):
+    # Node counts are the search signature: any difference means the search
+    # now behaves differently, not just faster or slower. Returns True if equal.
+    same = bench["depth"] == baseline["depth"]
+    if not same:
+        output.write(f"baseline was run at depth {baseline['depth']}\n")
+    baselineResults = {result["fen"]: result for result in baseline["positions"]}
+    for result in bench["positions"]:
+        old = baselineResults.get(result["fen"])
+        if old == None:
+            output.write(f"{result['name']:<15} not in baseline\n")
+            same = False
+        elif (old["nodes"] != result["nodes"]) or (old["bestMove"] != result["bestMove"]):
+            output.write(f"{result['name']:<15} signature changed: nodes {old['nodes']} -> "
+                         f"{result['nodes']}, best {old['bestMove']} -> {result['bestMove']}\n")
+            same = False
+    speedup = bench["nps"] / max(baseline["nps"], 1)
+    output.write(f"signature {'unchanged' if same else 'CHANGED'}, nodes {baseline['nodes']} -> "
+                 f"{bench['nodes']}, nps {baseline['nps']} -> {bench['nps']} ({speedup:.2f}x), "
+                 f"time {baseline['seconds']:.2f}s -> {bench['seconds']:.2f}s\n")
+    return same
+
+def compareWorkers(bench, serialBench, output=sys.stdout):
+    # Wall clock speedup of a parallel run over a single process run; root
+    # splitting searches more nodes, so nps alone overstates the gain
+    serialResults = {result["fen"]: result for result in serialBench["positions"]}
+    for result in bench["positions"]:
+        serial = serialResults[result["fen"]]
+        output.write(f"{result['name']:<15} time {serial['seconds']:6.2f}s -> {result['seconds']:6.2f}s "
+                     f"({serial['seconds'] / max(result['seconds'], 1e-6):.2f}x) nodes "
+                     f"{serial['nodes']} -> {result['nodes']}\n")
+    speedup = serialBench["seconds"] / max(bench["seconds"], 1e-6)
+    output.write(f"workers {bench['workers']} speedup {speedup:.2f}x, time {serialBench['seconds']:.2f}s -> "
+                 f"{bench['seconds']:.2f}s, nodes {serialBench['nodes']} -> {bench['nodes']}, "
+                 f"nps {serialBench['nps']} -> {bench['nps']}\n")
+    return speedup
+
+def runPruningReport(depth=BENCH_DEPTH, hashSizeMb=BENCH_HASH_MB, output=sys.stdout):
+    # Bench with every technique, without each one in turn and without all of
+    # them. The full width search is the reference for strength: how many best
+    # moves agree with it and how far the scores drift from it (centipawns).
+    fullWidth = runBench(depth, hashSizeMb, without=list(PRUNING_SWITCHES))
+    configurations = [("all techniques", ())] + \
+                     [(f"without {technique}", (technique,)) for technique in PRUNING_SWITCHES]
+    benches = [(name, runBench(depth, hashSizeMb, without=without)) for name, without in configurations]
+    benches.append(("full width", fullWidth))
+    reference = {result["fen"]: result for result in fullWidth["positions"]}
+    output.write(f"{'configuration':<20} {'nodes':>8} {'time':>7} {'same best':>9} {'score drift':>11}\n")
+    for name, bench in benches:
+        sameBest = sum(result["bestMove"] == reference[result["fen"]]["bestMove"]
+                       for result in bench["positions"])
+        drift = sum(abs(result["score"] - reference[result["fen"]]["score"])
+                    for result in bench["positions"]) / len(bench["positions"])
+        output.write(f"{name:<20} {bench['nodes']:>8} {bench['seconds']:>6.2f}s "
+                     f"{sameBest:>4}/{len(bench['positions']):<4} {drift:>11.1f}\n")
+    return benches
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Search benchmark")
+    parser.add_argument("--depth", type=int, default=BENCH_DEPTH, help="search depth")
+    parser.add_argument("--hash", type=int, default=BENCH_HASH_MB, help="hash size in MB")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="search processes; above 1 also runs one process to report the speedup")
+    parser.add_argument("--without", action="append", default=list(), choices=list(PRUNING_SWITCHES),
+                        help="switch off a selective search technique (repeatable)")
+    parser.add_argument("--pruning-report", action="store_true",
+                        help="compare node counts and best moves with each technique switched off")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    options = parser.parse_args(args)
+    if options.pruning_report:
+        runPruningReport(options.depth, options.hash)
+        return 0
+    bench = runBench(options.depth, options.hash, options.workers, options.without)
+    if options.workers > 1:
+        serialBench = runBench(options.depth, options.hash, without=options.without)
+        speedupOutput = io.StringIO()
+        bench["speedup"] = round(compareWorkers(bench, serialBench, speedupOutput), 4)
+    if options.json:
+        json.dump(bench, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        printBench(bench)
+    if options.workers > 1:
+        output = sys.stderr if options.json else sys.stdout
+        output.write("\n" + speedupOutput.getvalue())
+    if options.baseline != None:
+        with open(options.baseline) as baselineFile:
+            baseline = json.load(baselineFile)
+        output = sys.stderr if options.json else sys.stdout
+        if not compareBench(bench, baseline, output): return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
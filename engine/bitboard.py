@@ -0,0 +1,125 @@
+# chess [ai] engine
+# Bitboard helpers and attack tables, built once at import
+
+from engine.position import BOARD_DIM, NUM_SQUARES, WHITE, BLACK, getRow, getCol, \
+     getSquareIndex
+
+# Bit i of a bitboard is square i (a8 = bit 0, h1 = bit 63)
+FULL_BOARD  = (1 << NUM_SQUARES) - 1
+SQUARE_BITS = [1 << sq for sq in range(NUM_SQUARES)]
+
+FILE_A = sum(SQUARE_BITS[getSquareIndex(row, 0)] for row in range(BOARD_DIM))
+FILE_H = sum(SQUARE_BITS[getSquareIndex(row, BOARD_DIM-1)] for row in range(BOARD_DIM))
+NOT_FILE_A = FULL_BOARD ^ FILE_A
+NOT_FILE_H = FULL_BOARD ^ FILE_H
+# a1 is a dark square; row + col is odd on dark squares
+DARK_SQUARES = sum(SQUARE_BITS[sq] for sq in range(NUM_SQUARES) if ((sq >> 3) + (sq & 7)) & 1)
+
+def popCount(bb):
+    return bb.bit_count()
+
+def getLowestSquare(bb):
+    return (bb & -bb).bit_length() - 1
+
+def iterSquares(bb):
+    while bb:
+        lowBit = bb & -bb
+        yield lowBit.bit_length() - 1
+        bb ^= lowBit
+
+def isOnBoard(row, col):
+    return (0 <= row < BOARD_DIM) and (0 <= col < BOARD_DIM)
+
+def getOffsetMask(square, offsets):
+    mask = 0
+    row, col = getRow(square), getCol(square)
+    for dRow, dCol in offsets:
+        if isOnBoard(row+dRow, col+dCol):
+            mask |= SQUARE_BITS[getSquareIndex(row+dRow, col+dCol)]
+    return mask
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS   = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+# White pawns move towards row 0, black pawns towards row 7
+PAWN_OFFSETS   = [[(-1, -1), (-1, 1)], [(1, -1), (1, 1)]]
+
+KNIGHT_ATTACKS = [getOffsetMask(sq, KNIGHT_OFFSETS) for sq in range(NUM_SQUARES)]
+KING_ATTACKS   = [getOffsetMask(sq, KING_OFFSETS) for sq in range(NUM_SQUARES)]
+PAWN_ATTACKS   = [[getOffsetMask(sq, PAWN_OFFSETS[color]) for sq in range(NUM_SQUARES)]
+                  for color in (WHITE, BLACK)]
+
+ROOK_DIRECTIONS   = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+def getRayAttacks(square, directions, occupied):
+    mask = 0
+    for dRow, dCol in directions:
+        r, c = getRow(square) + dRow, getCol(square) + dCol
+        while isOnBoard(r, c):
+            mask |= SQUARE_BITS[getSquareIndex(r, c)]
+            if occupied & SQUARE_BITS[getSquareIndex(r, c)]: break
+            r += dRow
+            c += dCol
+    return mask
+
+def getRelevantMask(square, directions):
+    # Squares whose occupancy can block a ray (the board edge never blocks)
+    mask = 0
+    for dRow, dCol in directions:
+        r, c = getRow(square) + dRow, getCol(square) + dCol
+        while isOnBoard(r+dRow, c+dCol):
+            mask |= SQUARE_BITS[getSquareIndex(r, c)]
+            r += dRow
+            c += dCol
+    return mask
+
+def getAttackTable(square, directions, mask):
+    # Every blocker subset of the mask mapped to its attack set
+    table = dict()
+    subset = 0
+    while True:
+        table[subset] = getRayAttacks(square, directions, subset)
+        subset = (subset - mask) & mask
+        if subset == 0: break
+    return table
+
+# Sliding attacks are looked up by the occupied squares along each line.
+# Bishop lines are small enough to share one table per square; rook ranks
+# and files get one table each to keep the tables small.
+BISHOP_MASKS  = [getRelevantMask(sq, BISHOP_DIRECTIONS) for sq in range(NUM_SQUARES)]
+BISHOP_TABLES = [getAttackTable(sq, BISHOP_DIRECTIONS, BISHOP_MASKS[sq])
+                 for sq in range(NUM_SQUARES)]
+RANK_MASKS    = [getRelevantMask(sq, ROOK_DIRECTIONS[2:]) for sq in range(NUM_SQUARES)]
+RANK_TABLES   = [getAttackTable(sq, ROOK_DIRECTIONS[2:], RANK_MASKS[sq])
+                 for sq in range(NUM_SQUARES)]
+FILE_MASKS    = [getRelevantMask(sq, ROOK_DIRECTIONS[:2]) for sq in range(NUM_SQUARES)]
+FILE_TABLES   = [getAttackTable(sq, ROOK_DIRECTIONS[:2], FILE_MASKS[sq])
+                 for sq in range(NUM_SQUARES)]
+
+def getBishopAttacks(square, occupied):
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+
+def getRookAttacks(square, occupied):
+    return RANK_TABLES[square][occupied & RANK_MASKS[square]] | \
+           FILE_TABLES[square][occupied & FILE_MASKS[square]]
+
+def getQueenAttacks(square, occupied):
+    return getBishopAttacks(square, occupied) | getRookAttacks(square, occupied)
+
+def getBetweenMask(fromSquare, toSquare):
+    # Squares strictly between two squares on a shared rank, file or diagonal
+    dRow = getRow(toSquare) - getRow(fromSquare)
+    dCol = getCol(toSquare) - getCol(fromSquare)
+    if (fromSquare == toSquare) or not ((dRow == 0) or (dCol == 0) or (abs(dRow) == abs(dCol))):
+        return 0
+    stepRow = (dRow > 0) - (dRow < 0)
+    stepCol = (dCol > 0) - (dCol < 0)
+    mask = 0
+    r, c = getRow(fromSquare) + stepRow, getCol(fromSquare) + stepCol
+    while getSquareIndex(r, c) != toSquare:
+        mask |= SQUARE_BITS[getSquareIndex(r, c)]
+        r += stepRow
+        c += stepCol
+    return mask
+
+BETWEEN = [[getBetweenMask(a, b) for b in range(NUM_SQUARES)] for a in range(NUM_SQUARES)]
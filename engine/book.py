@@ -0,0 +1,197 @@
+# chess [ai] engine
+# Opening book: Polyglot-style entries sorted by key, read through a memory map
+# python -m engine.book build GAMES.pgn BOOK.bin [--plies N] [--min-games N]
+# python -m engine.book probe BOOK.bin [--fen FEN]
+# python -m engine.book check
+
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from engine.position import Position, START_FEN, NO_MOVE, moveToUci
+from engine.movegen import getLegalMoves, getMoveFromSan
+
+# Each entry is key (8 bytes), move (2), weight (2) and learn (4), big endian, as in
+# Polyglot books. Keys are this engine's Zobrist keys, so Polyglot books made by
+# other tools will not match any position.
+ENTRY_FORMAT = ">QHHI"
+ENTRY_SIZE   = struct.calcsize(ENTRY_FORMAT)
+
+# Book moves keep the from square, to square and promotion of an engine move
+BOOK_MOVE_MASK = 0x7fff
+MAX_WEIGHT     = 0xffff
+
+BOOK_PLIES     = 24
+BOOK_MIN_GAMES = 1
+
+# Weight of a move for the side that played it, by game result
+RESULT_WEIGHTS = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1), "*": (1, 1)}
+
+# PGN text that is not a move: comments, variations, NAGs, move numbers and results
+PGN_NOISE = re.compile(r"\{[^}]*\}|;[^\n]*|\$\d+|\d+\.(\.\.)?|1-0|0-1|1/2-1/2|\*")
+
+# Games for the check command, with positions entered by FEN (as other tools
+# write them, without a pointless en passant square) and the book moves expected
+CHECK_PGN = """[Result "1-0"]
+1. e4 e5 2. Nf3 Nc6 3. Bb5 1-0
+
+[Result "1/2-1/2"]
+1. e4 e5 2. Nf3 Nf6 1/2-1/2
+
+[Result "0-1"]
+1. Nf3 Nf6 2. e4 Nxe4 0-1
+"""
+CHECK_PROBES = [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", {"e2e4": 3, "g1f3": 0}),
+    ("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2", {"g1f3": 3}),
+    ("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2", {"g1f3": 3}),
+    ("rnbqkb1r/pppppppp/5n2/8/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 0 2", {"f6e4": 2})]
+
+class OpeningBook(object):
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.file = open(fileName, "rb")
+        size = os.path.getsize(fileName)
+        # Pages are read from disk only when a lookup touches them
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b""
+        self.entries = size // ENTRY_SIZE
+    def close(self):
+        if isinstance(self.data, mmap.mmap): self.data.close()
+        self.file.close()
+    def getEntry(self, index):
+        return struct.unpack_from(ENTRY_FORMAT, self.data, index * ENTRY_SIZE)
+    def findFirst(self, key):
+        # Binary search for the first entry with this key
+        low, high = 0, self.entries
+        while low < high:
+            middle = (low + high) // 2
+            if self.getEntry(middle)[0] < key: low = middle + 1
+            else: high = middle
+        return low
+    def getMoves(self, position):
+        # [(engine move, weight)] for the position, skipping moves that are not legal
+        legalMoves = {move & BOOK_MOVE_MASK: move for move in getLegalMoves(position)}
+        moves = list()
+        index = self.findFirst(position.key)
+        while index < self.entries:
+            key, bookMove, weight, learn = self.getEntry(index)
+            if key != position.key: break
+            if bookMove in legalMoves: moves.append((legalMoves[bookMove], weight))
+            index += 1
+        return moves
+    def chooseMove(self, position, random):
+        # A book move picked with probability proportional to its weight, or NO_MOVE
+        moves = [(move, weight) for move, weight in self.getMoves(position) if weight > 0]
+        if len(moves) == 0: return NO_MOVE
+        pick = random.randrange(sum(weight for move, weight in moves))
+        for move, weight in moves:
+            if pick < weight: return move
+            pick -= weight
+        return NO_MOVE
+
+def readPgnGames(pgnFile):
+    # Yields (result, starting FEN, [SAN moves]) for each game in a PGN file
+    result = "*"
+    fen = START_FEN
+    moveText = list()
+    for line in pgnFile:
+        line = line.strip()
+        if line.startswith("["):
+            if moveText:
+                yield result, fen, getSanMoves(" ".join(moveText))
+                moveText = list()
+                result = "*"
+                fen = START_FEN
+            if line.startswith("[Result "): result = line.split('"')[1]
+            if line.startswith("[FEN "): fen = line.split('"')[1]
+        elif line:
+            moveText.append(line)
+    if moveText: yield result, fen, getSanMoves(" ".join(moveText))
+
+def getSanMoves(moveText):
+    # Variations may nest, so they are removed innermost first
+    while "(" in moveText:
+        stripped = re.sub(r"\([^()]*\)", " ", moveText)
+        if stripped == moveText: break
+        moveText = stripped
+    return PGN_NOISE.sub(" ", moveText).split()
+
+def buildBook(pgnFile, bookFileName, plies=BOOK_PLIES, minGames=BOOK_MIN_GAMES):
+    # Returns (games read, entries written)
+    weights = dict()
+    counts = dict()
+    games = 0
+    for result, fen, sanMoves in readPgnGames(pgnFile):
+        games += 1
+        resultWeights = RESULT_WEIGHTS.get(result, RESULT_WEIGHTS["*"])
+        try:
+            position = Position.fromFen(fen)
+        except ValueError:
+            continue
+        for san in sanMoves[:plies]:
+            move = getMoveFromSan(position, san)
+            if move == NO_MOVE: break
+            entry = (position.key, move & BOOK_MOVE_MASK)
+            weights[entry] = weights.get(entry, 0) + resultWeights[position.sideToMove]
+            counts[entry] = counts.get(entry, 0) + 1
+            position.makeMove(move)
+    entries = 0
+    with open(bookFileName, "wb") as bookFile:
+        for entry in sorted(weights):
+            if counts[entry] < minGames: continue
+            bookFile.write(struct.pack(ENTRY_FORMAT, entry[0], entry[1],
+                                       min(weights[entry], MAX_WEIGHT), 0))
+            entries += 1
+    return games, entries
+
+def runCheck(output=sys.stdout):
+    # Build a book from CHECK_PGN and probe it; returns True when every probe
+    # finds the expected moves and weights
+    passed = True
+    with tempfile.TemporaryDirectory() as directory:
+        bookFileName = os.path.join(directory, "check.bin")
+        buildBook(CHECK_PGN.splitlines(), bookFileName)
+        book = OpeningBook(bookFileName)
+        for fen, expected in CHECK_PROBES:
+            moves = {moveToUci(move): weight for move, weight in book.getMoves(Position.fromFen(fen))}
+            if moves != expected:
+                output.write(f"book probe FAIL: {fen} -> {moves}, expected {expected}\n")
+                passed = False
+        book.close()
+    output.write(f"book probes {'ok' if passed else 'FAIL'}\n")
+    return passed
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Opening book tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a book from a PGN file")
+    build.add_argument("pgn", help="PGN file of games")
+    build.add_argument("book", help="book file to write")
+    build.add_argument("--plies", type=int, default=BOOK_PLIES, help="moves per game to include")
+    build.add_argument("--min-games", type=int, default=BOOK_MIN_GAMES,
+                       help="games a move must appear in")
+    probe = commands.add_parser("probe", help="list the book moves of a position")
+    probe.add_argument("book", help="book file to read")
+    probe.add_argument("--fen", default=START_FEN, help="position to look up")
+    commands.add_parser("check", help="build a small book and probe positions entered by FEN")
+    options = parser.parse_args(args)
+    if options.command == "check":
+        return 0 if runCheck() else 1
+    if options.command == "build":
+        with open(options.pgn, errors="replace") as pgnFile:
+            games, entries = buildBook(pgnFile, options.book, options.plies, options.min_games)
+        print(f"games {games} entries {entries}")
+        return 0
+    book = OpeningBook(options.book)
+    moves = book.getMoves(Position.fromFen(options.fen))
+    total = max(1, sum(weight for move, weight in moves))
+    for move, weight in sorted(moves, key=lambda moveWeight: -moveWeight[1]):
+        print(f"{moveToUci(move):<6} weight {weight:>5} {100 * weight / total:5.1f}%")
+    book.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
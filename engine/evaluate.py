@@ -0,0 +1,126 @@
+# chess [ai] engine
+# Material and piece-square evaluation, tapered between middlegame and endgame
+
+# Centipawn values (standard chess point system), indexed by engine piece type:
+# empty, pawn, knight, bishop, rook, queen, king
+PIECE_VALUES = [0, 100, 300, 300, 500, 900, 0]
+
+# Game phase weights; a full set of pieces gives MAX_PHASE (pure middlegame)
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0]
+MAX_PHASE     = 24
+
+# Piece-square tables from white's point of view, a8 first (same layout as squares)
+PAWN_MG = [  0,   0,   0,   0,   0,   0,   0,   0,
+            50,  50,  50,  50,  50,  50,  50,  50,
+            10,  10,  20,  30,  30,  20,  10,  10,
+             5,   5,  10,  25,  25,  10,   5,   5,
+             0,   0,   0,  20,  20,   0,   0,   0,
+             5,  -5, -10,   0,   0, -10,  -5,   5,
+             5,  10,  10, -20, -20,  10,  10,   5,
+             0,   0,   0,   0,   0,   0,   0,   0]
+
+PAWN_EG = [  0,   0,   0,   0,   0,   0,   0,   0,
+            80,  80,  80,  80,  80,  80,  80,  80,
+            50,  50,  50,  50,  50,  50,  50,  50,
+            30,  30,  30,  30,  30,  30,  30,  30,
+            15,  15,  15,  15,  15,  15,  15,  15,
+             5,   5,   5,   5,   5,   5,   5,   5,
+             0,   0,   0,   0,   0,   0,   0,   0,
+             0,   0,   0,   0,   0,   0,   0,   0]
+
+KNIGHT_PST = [-50, -40, -30, -30, -30, -30, -40, -50,
+              -40, -20,   0,   0,   0,   0, -20, -40,
+              -30,   0,  10,  15,  15,  10,   0, -30,
+              -30,   5,  15,  20,  20,  15,   5, -30,
+              -30,   0,  15,  20,  20,  15,   0, -30,
+              -30,   5,  10,  15,  15,  10,   5, -30,
+              -40, -20,   0,   5,   5,   0, -20, -40,
+              -50, -40, -30, -30, -30, -30, -40, -50]
+
+BISHOP_PST = [-20, -10, -10, -10, -10, -10, -10, -20,
+              -10,   0,   0,   0,   0,   0,   0, -10,
+              -10,   0,   5,  10,  10,   5,   0, -10,
+              -10,   5,   5,  10,  10,   5,   5, -10,
+              -10,   0,  10,  10,  10,  10,   0, -10,
+              -10,  10,  10,  10,  10,  10,  10, -10,
+              -10,   5,   0,   0,   0,   0,   5, -10,
+              -20, -10, -10, -10, -10, -10, -10, -20]
+
+ROOK_PST = [  0,   0,   0,   0,   0,   0,   0,   0,
+              5,  10,  10,  10,  10,  10,  10,   5,
+             -5,   0,   0,   0,   0,   0,   0,  -5,
+             -5,   0,   0,   0,   0,   0,   0,  -5,
+             -5,   0,   0,   0,   0,   0,   0,  -5,
+             -5,   0,   0,   0,   0,   0,   0,  -5,
+             -5,   0,   0,   0,   0,   0,   0,  -5,
+              0,   0,   0,   5,   5,   0,   0,   0]
+
+QUEEN_PST = [-20, -10, -10,  -5,  -5, -10, -10, -20,
+             -10,   0,   0,   0,   0,   0,   0, -10,
+             -10,   0,   5,   5,   5,   5,   0, -10,
+              -5,   0,   5,   5,   5,   5,   0,  -5,
+               0,   0,   5,   5,   5,   5,   0,  -5,
+             -10,   5,   5,   5,   5,   5,   0, -10,
+             -10,   0,   5,   0,   0,   0,   0, -10,
+             -20, -10, -10,  -5,  -5, -10, -10, -20]
+
+KING_MG = [-30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -20, -30, -30, -40, -40, -30, -30, -20,
+           -10, -20, -20, -20, -20, -20, -20, -10,
+            20,  20,   0,   0,   0,   0,  20,  20,
+            20,  30,  10,   0,   0,  10,  30,  20]
+
+KING_EG = [-50, -40, -30, -20, -20, -30, -40, -50,
+           -30, -20, -10,   0,   0, -10, -20, -30,
+           -30, -10,  20,  30,  30,  20, -10, -30,
+           -30, -10,  30,  40,  40,  30, -10, -30,
+           -30, -10,  30,  40,  40,  30, -10, -30,
+           -30, -10,  20,  30,  30,  20, -10, -30,
+           -30, -30,   0,   0,   0,   0, -30, -30,
+           -50, -30, -30, -30, -30, -30, -30, -50]
+
+EMPTY_PST = [0] * 64
+
+MG_PST = [EMPTY_PST, PAWN_MG, KNIGHT_PST, BISHOP_PST, ROOK_PST, QUEEN_PST, KING_MG]
+EG_PST = [EMPTY_PST, PAWN_EG, KNIGHT_PST, BISHOP_PST, ROOK_PST, QUEEN_PST, KING_EG]
+
+def getPieceTables(pst):
+    # Signed scores (white positive) by piece code (type | color << 3) and square;
+    # black reads the white table mirrored top to bottom (square ^ 56)
+    tables = [[0] * 64 for piece in range(16)]
+    for pieceType in range(1, 7):
+        for square in range(64):
+            tables[pieceType][square] = PIECE_VALUES[pieceType] + pst[pieceType][square]
+            tables[pieceType | 8][square] = -(PIECE_VALUES[pieceType] + pst[pieceType][square ^ 56])
+    return tables
+
+MG_TABLES = getPieceTables(MG_PST)
+EG_TABLES = getPieceTables(EG_PST)
+
+def evaluate(position):
+    # Scores are kept up to date by Position.putPiece/removePiece, so this is O(1)
+    phase = min(position.phase, MAX_PHASE)
+    return (position.mgScore * phase + position.egScore * (MAX_PHASE - phase)) // MAX_PHASE
+
+# Mate scores count down with the distance to mate in plies; anything beyond
+# MATE_BOUND is a forced mate
+MATE_SCORE = 100000
+MATE_BOUND = MATE_SCORE - 1000
+
+def getTerminalScore(inCheck, ply):
+    # Score for the side to move when it has no legal moves: mated or stalemate
+    return -(MATE_SCORE - ply) if inCheck else 0
+
+def scoreToTable(score, ply):
+    # Mate scores are stored relative to the node, not the root
+    if score > MATE_BOUND: return score + ply
+    if score < -MATE_BOUND: return score - ply
+    return score
+
+def scoreFromTable(score, ply):
+    if score > MATE_BOUND: return score - ply
+    if score < -MATE_BOUND: return score + ply
+    return score
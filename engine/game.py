@@ -0,0 +1,375 @@
+# chess [ai] engine
+# Game model: chess pieces on a board, turns and the chess rules applied to them
+
+from engine.position import Position, squareIndex, squareName, getSquareIndex, \
+     getRow, getCol, makePiece, getPieceColor, getPieceType, BOARD_DIM, \
+     START_LETTER, START_LAYOUT, COLOR_NAMES, PIECE_NAMES, PIECE_TYPES, EMPTY, \
+     NO_SQUARE, WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE, \
+     getFromSquare, getToSquare, getPromotion, WHITE, BLACK, PAWN, KNIGHT, BISHOP, \
+     ROOK, QUEEN
+from engine.movegen import getLegalMoves, getLegalTargets, isInCheck
+from engine.bitboard import SQUARE_BITS, DARK_SQUARES, popCount
+from engine.evaluate import PIECE_VALUES
+
+OFF_BOARD = "Off_Board"
+
+# Castling rights as (king square, rook square, engine castling flag)
+CASTLING_SQUARES = [("e1", "h1", WHITE_KINGSIDE), ("e1", "a1", WHITE_QUEENSIDE),
+                    ("e8", "h8", BLACK_KINGSIDE), ("e8", "a8", BLACK_QUEENSIDE)]
+
+# Rook move (from, to) for each castling king destination
+CASTLING_ROOK_MOVES = {"c1": ("a1", "d1"), "g1": ("h1", "f1"),
+                       "c8": ("a8", "d8"), "g8": ("h8", "f8")}
+
+# Game status, updated once per move
+PLAYING               = "playing"
+CHECK                 = "check"
+CHECKMATE             = "checkmate"
+STALEMATE             = "stalemate"
+INSUFFICIENT_MATERIAL = "insufficient material"
+FIFTY_MOVE_RULE       = "fifty-move rule"
+DRAWS                 = [STALEMATE, INSUFFICIENT_MATERIAL, FIFTY_MOVE_RULE]
+
+# Half moves without a capture or pawn move before the game is drawn
+FIFTY_MOVE_PLIES = 100
+
+# moveTurn of a piece placed from a FEN; never equal to turn - 1, so the piece
+# cannot look like a pawn that just moved two squares
+NO_TURN = -1
+
+# View to Model
+def getRowCol(square):
+    row = BOARD_DIM - int(square[1])
+    col = ord(square[0]) - ord(START_LETTER)
+    return row, col
+
+# Model to View
+def getSquare(row, col):
+    return chr(ord(START_LETTER)+col) + str(BOARD_DIM-row)
+
+def getOpponentColor(color):
+    return ("black" if color == "white" else "white")
+
+def isInsufficientMaterial(position):
+    # Bare kings, a single minor piece, or only bishops that all stand on one square color
+    for pieceType in (PAWN, ROOK, QUEEN):
+        if position.getPieces(WHITE, pieceType) | position.getPieces(BLACK, pieceType):
+            return False
+    knights = position.getPieces(WHITE, KNIGHT) | position.getPieces(BLACK, KNIGHT)
+    bishops = position.getPieces(WHITE, BISHOP) | position.getPieces(BLACK, BISHOP)
+    if popCount(knights | bishops) <= 1: return True
+    if knights: return False
+    return ((bishops & DARK_SQUARES) == 0) or ((bishops & ~DARK_SQUARES) == 0)
+
+class ChessPiece(object):
+    def __init__(self, color, pieceType):
+        self.color = color
+        self.pieceType = pieceType
+        self.location = OFF_BOARD
+        self.initialMove = True
+        self.moveCount = 0
+        self.moveTurn = 0
+        self.active = True
+        self.promoted = False
+    def __repr__(self):
+        if self.pieceType == "king":
+            return f"{self.pieceType[0]}{self.color[0]}".upper()
+        else:
+            return f"{self.color[0]}{self.pieceType[0]}".upper()
+    def __eq__(self, other):
+        return (isinstance(other, ChessPiece) and \
+                (self.color     == other.color) and \
+                (self.pieceType == other.pieceType) and \
+                (self.active    == other.active == True) and \
+                (self.location  == other.location))
+    def getCentipawns(self):
+        return PIECE_VALUES[PIECE_TYPES[self.pieceType]]
+
+# Algorithm inspired by: https://towardsdatascience.com/create-ai-for-your-own-board-game-from-scratch-minimax-part-2-517e1c1e3362
+class GameState(object):
+    def __init__(self):
+        self.turn = 1
+        self.gameOver = False
+        self.status = PLAYING
+        # Half moves since the last capture or pawn move (fifty-move rule)
+        self.halfmoveClock = 0
+        # Square to piece index ("--" when empty), kept up to date by updateBoard
+        rng = range(BOARD_DIM)
+        self.board = [["--" for c in rng] for r in rng]
+        self.pieces = list()
+        # Squares whose contents changed since the UI last redrew them
+        self.changedSquares = set()
+        # Kings and corner rooks by color and home square, for castling and checkmate
+        self.kings = dict()
+        self.rooks = dict()
+        self.startingSquares = list()
+        self.createPieces()
+    @classmethod
+    def fromFen(cls, fen):
+        game = cls()
+        game.loadPosition(Position.fromFen(fen))
+        return game
+    def toFen(self):
+        return self.getPosition().toFen()
+    def createPieces(self):
+        for color in COLOR_NAMES:
+            pawnRow = 6 if color == "white" else 1
+            homeRow = 7 if color == "white" else 0
+            for col in range(BOARD_DIM):
+                self.addStartingPiece(color, "pawn", getSquare(pawnRow, col))
+            for col in range(BOARD_DIM):
+                self.addStartingPiece(color, PIECE_NAMES[START_LAYOUT[col]], getSquare(homeRow, col))
+    def addStartingPiece(self, color, pieceType, square):
+        piece = ChessPiece(color, pieceType)
+        self.pieces.append(piece)
+        self.startingSquares.append((piece, square))
+        if pieceType == "king": self.kings[color] = piece
+        elif pieceType == "rook": self.rooks[square] = piece
+    def getPlayerTurn(self, color=True):
+        # Black player = 0
+        # White player = 1
+        if color: return "white" if self.turn % 2 == 1 else "black"
+        else: return self.turn % 2
+    def resetBoard(self):
+        self.turn = 1
+        self.gameOver = False
+        self.status = PLAYING
+        self.halfmoveClock = 0
+        rng = range(BOARD_DIM)
+        self.board = [["--" for c in rng] for r in rng]
+        self.changedSquares = set(getSquare(r, c) for r in rng for c in rng)
+    def updateBoard(self, piece, oldRowCol, newRowCol, board=None):
+        b = self.board if board == None else board
+        rOld, cOld = oldRowCol
+        rNew, cNew = newRowCol
+        if rOld != None: b[rOld][cOld] = "--"
+        if piece.active: b[rNew][cNew] = piece
+        else: board[rNew][cNew] = "--"
+        if board != None: return b
+    # Set or reset the chess board
+    def setChessBoard(self):
+        self.resetBoard()
+        for piece, square in self.startingSquares:
+            self.movePiece(piece, square)
+        self.updateStatus()
+    def resetChessPieces(self):
+        index = 0
+        while index < len(self.pieces):
+            if self.pieces[index].promoted:
+                self.pieces.remove(self.pieces[index])
+            else:
+                self.pieces[index].location = OFF_BOARD
+                self.pieces[index].moveCount = 0
+                self.pieces[index].initialMove = True
+                self.pieces[index].active = True
+                index += 1
+    def getUnusedPiece(self, color, pieceType):
+        for piece in self.pieces:
+            if (not piece.active) and (piece.location == OFF_BOARD) and \
+               (piece.color == color) and (piece.pieceType == pieceType):
+                return piece
+        # Extra pieces beyond the starting set are treated like promoted pieces
+        piece = ChessPiece(color, pieceType)
+        piece.promoted = True
+        self.pieces.append(piece)
+        return piece
+    def getSelection(self, square, color="both"):
+        row, col = getRowCol(square)
+        piece = self.board[row][col]
+        if isinstance(piece, ChessPiece) and piece.active and \
+           ((color == "both") or (piece.color == color)):
+                return piece
+        return square
+    def getEnPassantPawn(self, row, col, color):
+        otherPawn = None
+        sameRow = 3 if color == "white" else 4
+        if row == sameRow:
+            for c in (col-1, col+1):
+                if (c < 0) or (c >= BOARD_DIM): continue
+                p = self.board[sameRow][c]
+                if isinstance(p, ChessPiece) and p.active and (p.color != color) and \
+                  (p.moveTurn == self.turn-1) and (p.moveCount == 1) and (p.pieceType == "pawn"):
+                    return p
+        return otherPawn
+    def movePiece(self, piece, newSquare):
+        if (piece.pieceType == "king") and (piece.location != OFF_BOARD) and piece.initialMove:
+            # King-side and queen-side castling moves!
+            if newSquare in CASTLING_ROOK_MOVES:
+                rookSquare, rookTarget = CASTLING_ROOK_MOVES[newSquare]
+                self.movePiece(self.rooks[rookSquare], rookTarget)
+        if piece.location != OFF_BOARD:
+            oldRow, oldCol = getRowCol(piece.location)
+            self.changedSquares.add(piece.location)
+        else:
+            oldRow = oldCol = None
+        newRow, newCol = getRowCol(newSquare)
+        self.updateBoard(piece, (oldRow, oldCol), (newRow, newCol))
+        piece.location = newSquare
+        self.changedSquares.add(newSquare)
+        if piece.pieceType == "pawn":
+            # Pawn promotion
+            if (((piece.color == "white") and (piece.location[1] == "8")) or \
+                ((piece.color == "black") and (piece.location[1] == "1"))):
+                    piece.active = False
+                    self.promotePawn(piece.location, piece.color)
+            # Pawn en passant attack
+            otherPawn = self.getEnPassantPawn(oldRow, oldCol, piece.color)
+            if (otherPawn != None):
+                r, c = getRowCol(otherPawn.location)
+                dRow = -1 if piece.color == "white" else 1
+                if newSquare == getSquare(r+dRow, c): self.killPiece(otherPawn)
+    def promotePawn(self, square, pieceColor):
+        promotedQueen = ChessPiece(pieceColor, "queen")
+        self.pieces.append(promotedQueen)
+        promotedQueen.promoted = True
+        self.movePiece(promotedQueen, square)
+    def killPiece(self, piece):
+        row, col = getRowCol(piece.location)
+        if self.board[row][col] is piece: self.board[row][col] = "--"
+        self.changedSquares.add(piece.location)
+        piece.active = False
+    def makeMove(self, piece, square):
+        # Play a legal move; returns the check or checkmate message, if any
+        opponentColor = getOpponentColor(piece.color)
+        selection = self.getSelection(square, opponentColor)
+        if isinstance(selection, ChessPiece): self.killPiece(selection)
+        if isinstance(selection, ChessPiece) or (piece.pieceType == "pawn"):
+            self.halfmoveClock = 0
+        else: self.halfmoveClock += 1
+        self.movePiece(piece, square)
+        piece.moveCount += 1
+        piece.moveTurn = self.turn
+        if piece.initialMove: piece.initialMove = False
+        self.turn += 1
+        self.updateStatus()
+        message = None
+        if self.status == CHECKMATE:
+            self.kings[opponentColor].active = False
+            message = f"checkmate! {piece.color} wins"
+        elif self.status == CHECK:
+            message = f"{opponentColor} king in check!"
+        elif self.status in DRAWS:
+            message = "the game is a draw!"
+        return message
+    def updateStatus(self):
+        # Computed once per move and cached, so the UI never generates moves to find out
+        position = self.getPosition()
+        inCheck = isInCheck(position)
+        if len(getLegalMoves(position)) == 0:
+            self.status = CHECKMATE if inCheck else STALEMATE
+        elif isInsufficientMaterial(position):
+            self.status = INSUFFICIENT_MATERIAL
+        elif self.halfmoveClock >= FIFTY_MOVE_PLIES:
+            self.status = FIFTY_MOVE_RULE
+        else:
+            self.status = CHECK if inCheck else PLAYING
+        self.gameOver = (self.status == CHECKMATE) or (self.status in DRAWS)
+        return self.status
+    def isKingInCheck(self, color):
+        return isInCheck(self.getPosition(color))
+    def isCheckmate(self, color):
+        position = self.getPosition(color)
+        return isInCheck(position) and (len(getLegalMoves(position)) == 0)
+    def isLegalMove(self, selectedPiece, selectedSquare, color):
+        # Compare move to the engine's legal targets for the selected piece
+        position = self.getPosition(color)
+        targets = getLegalTargets(position, squareIndex(selectedPiece.location))
+        return (targets & SQUARE_BITS[squareIndex(selectedSquare)]) != 0
+    def getAllLegalMoves(self, color, boardState=None):
+        # The UI only promotes to queens, so under-promotions are left out
+        position = self.getPosition(color, boardState)
+        return [self.getPieceMove(move, boardState) for move in getLegalMoves(position)
+                if getPromotion(move) in (EMPTY, PIECE_TYPES["queen"])]
+    def getPosition(self, color=None, board=None):
+        # Model to engine position
+        b = self.board if board == None else board
+        color = self.getPlayerTurn() if color == None else color
+        position = Position()
+        for row in range(BOARD_DIM):
+            for col in range(BOARD_DIM):
+                piece = b[row][col]
+                if isinstance(piece, ChessPiece) and piece.active:
+                    pieceCode = makePiece(COLOR_NAMES.index(piece.color),
+                                          PIECE_TYPES[piece.pieceType])
+                    position.putPiece(getSquareIndex(row, col), pieceCode)
+        position.sideToMove = COLOR_NAMES.index(color)
+        position.halfmoveClock = self.halfmoveClock
+        position.fullmoveNumber = (self.turn + 1) // 2
+        for kingSquare, rookSquare, castlingFlag in CASTLING_SQUARES:
+            king = b[getRow(squareIndex(kingSquare))][getCol(squareIndex(kingSquare))]
+            rook = b[getRow(squareIndex(rookSquare))][getCol(squareIndex(rookSquare))]
+            if isinstance(king, ChessPiece) and king.active and king.initialMove and \
+               (king.pieceType == "king") and isinstance(rook, ChessPiece) and \
+               rook.active and rook.initialMove and (rook.pieceType == "rook") and \
+               (rook.color == king.color):
+                    position.castling |= castlingFlag
+        # A pawn that just moved two squares can be captured en passant
+        sameRow = 3 if color == "white" else 4
+        dRow = -1 if color == "white" else 1
+        for col in range(BOARD_DIM):
+            pawn = b[sameRow][col]
+            if isinstance(pawn, ChessPiece) and pawn.active and \
+               (pawn.pieceType == "pawn") and (pawn.color != color) and \
+               (pawn.moveCount == 1) and (pawn.moveTurn == self.turn-1):
+                    position.epSquare = getSquareIndex(sameRow+dRow, col)
+        position.refreshKey()
+        return position
+    def loadPosition(self, position):
+        # Engine position to model, reusing this game's chess pieces
+        self.resetBoard()
+        self.resetChessPieces()
+        for piece in self.pieces: piece.active = False
+        self.turn = 2 * (position.fullmoveNumber - 1) + position.sideToMove + 1
+        self.halfmoveClock = position.halfmoveClock
+        homePieces = {squareIndex(square): rook for square, rook in self.rooks.items()}
+        occupiedSquares = [sq for sq in range(BOARD_DIM*BOARD_DIM)
+                           if position.pieceAt(sq) != EMPTY]
+        # Kings and corner rooks keep their named pieces so castling still works
+        placedSquares = set()
+        for sq in occupiedSquares:
+            pieceCode = position.pieceAt(sq)
+            color = COLOR_NAMES[getPieceColor(pieceCode)]
+            pieceType = PIECE_NAMES[getPieceType(pieceCode)]
+            if pieceType == "king":
+                piece = self.kings[color]
+            elif (sq in homePieces) and (homePieces[sq].color == color) and \
+                 (pieceType == "rook"):
+                piece = homePieces[sq]
+            else: continue
+            self.placePiece(piece, sq, position)
+            placedSquares.add(sq)
+        for sq in occupiedSquares:
+            if sq in placedSquares: continue
+            pieceCode = position.pieceAt(sq)
+            color = COLOR_NAMES[getPieceColor(pieceCode)]
+            pieceType = PIECE_NAMES[getPieceType(pieceCode)]
+            piece = self.getUnusedPiece(color, pieceType)
+            self.placePiece(piece, sq, position)
+        self.updateStatus()
+    def getPieceMove(self, move, board=None):
+        # Engine move to (chess piece, square name) on the model
+        b = self.board if board == None else board
+        fromSquare = getFromSquare(move)
+        return b[getRow(fromSquare)][getCol(fromSquare)], squareName(getToSquare(move))
+    def placePiece(self, piece, sq, position):
+        row, col = getRow(sq), getCol(sq)
+        piece.active = True
+        piece.location = squareName(sq)
+        if piece.pieceType == "pawn":
+            piece.initialMove = (row == (6 if piece.color == "white" else 1))
+        elif piece.pieceType == "king":
+            rights = (WHITE_KINGSIDE | WHITE_QUEENSIDE) if piece.color == "white" \
+                else (BLACK_KINGSIDE | BLACK_QUEENSIDE)
+            piece.initialMove = (position.castling & rights) != 0
+        elif piece.pieceType == "rook":
+            piece.initialMove = False
+            for kingSquare, rookSquare, castlingFlag in CASTLING_SQUARES:
+                if (squareIndex(rookSquare) == sq) and (position.castling & castlingFlag):
+                    piece.initialMove = True
+        piece.moveCount = 0 if piece.initialMove else 1
+        piece.moveTurn = NO_TURN
+        dRow = 1 if COLOR_NAMES[position.sideToMove] == "white" else -1
+        if (position.epSquare != NO_SQUARE) and (piece.pieceType == "pawn") and \
+           (getCol(position.epSquare) == col) and (getRow(position.epSquare) + dRow == row):
+                piece.moveTurn = self.turn - 1
+        self.board[row][col] = piece
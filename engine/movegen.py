@@ -0,0 +1,272 @@
+# chess [ai] engine
+# Move generation from bitboard attack tables
+
+from engine.position import WHITE, EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, \
+     KING, NO_SQUARE, BOARD_DIM, WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, \
+     BLACK_QUEENSIDE, CAPTURE, DOUBLE_PUSH, EN_PASSANT, CASTLING, NO_MOVE, \
+     squareIndex, getSquareIndex, encodeMove, getFromSquare, getToSquare, \
+     getPromotion, getMoveFlags, getPieceType, squareName, moveToUci, SQUARE_NAMES
+from engine.bitboard import FULL_BOARD, SQUARE_BITS, NOT_FILE_A, NOT_FILE_H, \
+     KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BETWEEN, iterSquares, getLowestSquare, \
+     getBishopAttacks, getRookAttacks, getQueenAttacks
+
+PROMOTION_TYPES = [QUEEN, ROOK, BISHOP, KNIGHT]
+
+# Piece letters of standard algebraic notation, indexed by piece type
+SAN_PIECES = ".PNBRQK"
+
+ROW_MASKS = [sum(SQUARE_BITS[getSquareIndex(row, col)] for col in range(BOARD_DIM))
+             for row in range(BOARD_DIM)]
+PROMOTION_ROWS = ROW_MASKS[0] | ROW_MASKS[BOARD_DIM-1]
+
+# (castling flag, king from, king to, squares that must be empty,
+#  squares the king passes through that must not be attacked)
+CASTLING_MOVES = [
+    [(WHITE_KINGSIDE, "e1", "g1", ["f1", "g1"], ["e1", "f1", "g1"]),
+     (WHITE_QUEENSIDE, "e1", "c1", ["b1", "c1", "d1"], ["e1", "d1", "c1"])],
+    [(BLACK_KINGSIDE, "e8", "g8", ["f8", "g8"], ["e8", "f8", "g8"]),
+     (BLACK_QUEENSIDE, "e8", "c8", ["b8", "c8", "d8"], ["e8", "d8", "c8"])]]
+CASTLING_MOVES = [[(flag, squareIndex(kingFrom), squareIndex(kingTo),
+                    sum(SQUARE_BITS[squareIndex(s)] for s in emptySquares),
+                    [squareIndex(s) for s in safeSquares])
+                   for flag, kingFrom, kingTo, emptySquares, safeSquares in colorMoves]
+                  for colorMoves in CASTLING_MOVES]
+
+def getAttackers(position, square, byColor, occupied):
+    boards = position.pieceBoards
+    base = byColor << 3
+    queens = boards[base | QUEEN]
+    return (PAWN_ATTACKS[byColor ^ 1][square] & boards[base | PAWN]) | \
+           (KNIGHT_ATTACKS[square] & boards[base | KNIGHT]) | \
+           (KING_ATTACKS[square] & boards[base | KING]) | \
+           (getBishopAttacks(square, occupied) & (boards[base | BISHOP] | queens)) | \
+           (getRookAttacks(square, occupied) & (boards[base | ROOK] | queens))
+
+def isSquareAttacked(position, square, byColor, occupied=None, excluded=0):
+    if occupied == None: occupied = position.occupied
+    return (getAttackers(position, square, byColor, occupied) & ~excluded) != 0
+
+def isInCheck(position, color=None):
+    color = position.sideToMove if color == None else color
+    return isSquareAttacked(position, position.kingSquares[color], color ^ 1)
+
+def getPieceAttacks(pieceType, color, square, occupied):
+    if   pieceType == PAWN:   return PAWN_ATTACKS[color][square]
+    elif pieceType == KNIGHT: return KNIGHT_ATTACKS[square]
+    elif pieceType == BISHOP: return getBishopAttacks(square, occupied)
+    elif pieceType == ROOK:   return getRookAttacks(square, occupied)
+    elif pieceType == QUEEN:  return getQueenAttacks(square, occupied)
+    elif pieceType == KING:   return KING_ATTACKS[square]
+    return 0
+
+def addPawnMoves(moves, targets, offset, flags):
+    for toSquare in iterSquares(targets):
+        fromSquare = toSquare - offset
+        if SQUARE_BITS[toSquare] & PROMOTION_ROWS:
+            for promotion in PROMOTION_TYPES:
+                moves.append(encodeMove(fromSquare, toSquare, promotion, flags))
+        else:
+            moves.append(encodeMove(fromSquare, toSquare, EMPTY, flags))
+
+def addPawnSetMoves(moves, color, pawns, empty, enemies, targetMask):
+    # Pushes and captures for a whole set of pawns at once
+    if color == WHITE:
+        singles = (pawns >> 8) & empty
+        doubles = ((singles & ROW_MASKS[5]) >> 8) & empty
+        addPawnMoves(moves, singles & targetMask, -8, 0)
+        addPawnMoves(moves, doubles & targetMask, -16, DOUBLE_PUSH)
+        addPawnMoves(moves, ((pawns & NOT_FILE_A) >> 9) & enemies & targetMask, -9, CAPTURE)
+        addPawnMoves(moves, ((pawns & NOT_FILE_H) >> 7) & enemies & targetMask, -7, CAPTURE)
+    else:
+        singles = (pawns << 8) & empty
+        doubles = ((singles & ROW_MASKS[2]) << 8) & empty
+        addPawnMoves(moves, singles & targetMask, 8, 0)
+        addPawnMoves(moves, doubles & targetMask, 16, DOUBLE_PUSH)
+        addPawnMoves(moves, ((pawns & NOT_FILE_A) << 7) & enemies & targetMask, 7, CAPTURE)
+        addPawnMoves(moves, ((pawns & NOT_FILE_H) << 9) & enemies & targetMask, 9, CAPTURE)
+
+def addPieceMoves(moves, fromSquare, targets, enemies):
+    for toSquare in iterSquares(targets):
+        flags = CAPTURE if SQUARE_BITS[toSquare] & enemies else 0
+        moves.append(encodeMove(fromSquare, toSquare, EMPTY, flags))
+
+def getPseudoLegalMoves(position, color=None):
+    color = position.sideToMove if color == None else color
+    moves = list()
+    boards = position.pieceBoards
+    base = color << 3
+    occupied = position.occupied
+    empty = FULL_BOARD ^ occupied
+    friends = position.colorBoards[color]
+    enemies = position.colorBoards[color ^ 1]
+    notFriends = FULL_BOARD ^ friends
+    pawns = boards[base | PAWN]
+    addPawnSetMoves(moves, color, pawns, empty, enemies, FULL_BOARD)
+    if (position.epSquare != NO_SQUARE) and (color == position.sideToMove):
+        for fromSquare in iterSquares(PAWN_ATTACKS[color ^ 1][position.epSquare] & pawns):
+            moves.append(encodeMove(fromSquare, position.epSquare, EMPTY, CAPTURE | EN_PASSANT))
+    for fromSquare in iterSquares(boards[base | KNIGHT]):
+        addPieceMoves(moves, fromSquare, KNIGHT_ATTACKS[fromSquare] & notFriends, enemies)
+    for fromSquare in iterSquares(boards[base | BISHOP]):
+        targets = getBishopAttacks(fromSquare, occupied) & notFriends
+        addPieceMoves(moves, fromSquare, targets, enemies)
+    for fromSquare in iterSquares(boards[base | ROOK]):
+        targets = getRookAttacks(fromSquare, occupied) & notFriends
+        addPieceMoves(moves, fromSquare, targets, enemies)
+    for fromSquare in iterSquares(boards[base | QUEEN]):
+        targets = getQueenAttacks(fromSquare, occupied) & notFriends
+        addPieceMoves(moves, fromSquare, targets, enemies)
+    kingSquare = position.kingSquares[color]
+    if kingSquare != NO_SQUARE:
+        addPieceMoves(moves, kingSquare, KING_ATTACKS[kingSquare] & notFriends, enemies)
+        addCastlingMoves(moves, position, color, kingSquare)
+    return moves
+
+def addCastlingMoves(moves, position, color, kingSquare):
+    for flag, kingFrom, kingTo, emptyMask, safeSquares in CASTLING_MOVES[color]:
+        if (position.castling & flag) and (kingSquare == kingFrom) and \
+           not (position.occupied & emptyMask):
+            for square in safeSquares:
+                if isSquareAttacked(position, square, color ^ 1): break
+            else:
+                moves.append(encodeMove(kingFrom, kingTo, EMPTY, CASTLING))
+
+def isLegal(position, move):
+    # A move is legal if it does not leave the mover's own king attacked
+    fromSquare = getFromSquare(move)
+    toSquare = getToSquare(move)
+    flags = getMoveFlags(move)
+    if flags & CASTLING: return True
+    color = position.squares[fromSquare] >> 3
+    kingSquare = position.kingSquares[color]
+    occupied = (position.occupied ^ SQUARE_BITS[fromSquare]) | SQUARE_BITS[toSquare]
+    captured = SQUARE_BITS[toSquare] if flags & CAPTURE else 0
+    if flags & EN_PASSANT:
+        captured = SQUARE_BITS[toSquare + (8 if color == WHITE else -8)]
+        occupied ^= captured
+    if fromSquare == kingSquare: kingSquare = toSquare
+    return not isSquareAttacked(position, kingSquare, color ^ 1, occupied, captured)
+
+def getCheckAndPinMasks(position, color):
+    # Pieces giving check, and for each pinned piece the squares it may still move to
+    kingSquare = position.kingSquares[color]
+    boards = position.pieceBoards
+    base = (color ^ 1) << 3
+    occupied = position.occupied
+    queens = boards[base | QUEEN]
+    checkers = getAttackers(position, kingSquare, color ^ 1, occupied)
+    snipers = (getRookAttacks(kingSquare, 0) & (boards[base | ROOK] | queens)) | \
+              (getBishopAttacks(kingSquare, 0) & (boards[base | BISHOP] | queens))
+    pinMasks = dict()
+    for sniper in iterSquares(snipers):
+        blockers = BETWEEN[kingSquare][sniper] & occupied
+        if blockers and not (blockers & (blockers - 1)) and \
+           (blockers & position.colorBoards[color]):
+            pinMasks[getLowestSquare(blockers)] = BETWEEN[kingSquare][sniper] | SQUARE_BITS[sniper]
+    return checkers, pinMasks
+
+def getLegalMoves(position, color=None, capturesOnly=False):
+    # Targets are generated per piece and clipped by the check and pin masks,
+    # so only the king (and en passant) still need an attack test per move.
+    # With capturesOnly, quiet moves other than promotions are skipped.
+    color = position.sideToMove if color == None else color
+    kingSquare = position.kingSquares[color]
+    if kingSquare == NO_SQUARE:
+        return [move for move in getPseudoLegalMoves(position, color) if isLegal(position, move)
+                if not capturesOnly or (getMoveFlags(move) & CAPTURE) or getPromotion(move)]
+    moves = list()
+    boards = position.pieceBoards
+    base = color << 3
+    occupied = position.occupied
+    empty = FULL_BOARD ^ occupied
+    enemies = position.colorBoards[color ^ 1]
+    notFriends = FULL_BOARD ^ position.colorBoards[color]
+    if capturesOnly:
+        empty &= PROMOTION_ROWS
+        notFriends = enemies
+    checkers, pinMasks = getCheckAndPinMasks(position, color)
+    if checkers & (checkers - 1): checkMask = 0
+    elif checkers: checkMask = checkers | BETWEEN[kingSquare][getLowestSquare(checkers)]
+    else: checkMask = FULL_BOARD
+    pinned = 0
+    for square in pinMasks: pinned |= SQUARE_BITS[square]
+    if checkMask:
+        pawns = boards[base | PAWN]
+        addPawnSetMoves(moves, color, pawns & ~pinned, empty, enemies, checkMask)
+        for fromSquare in iterSquares(pawns & pinned):
+            addPawnSetMoves(moves, color, SQUARE_BITS[fromSquare], empty, enemies,
+                            checkMask & pinMasks[fromSquare])
+        if (position.epSquare != NO_SQUARE) and (color == position.sideToMove):
+            for fromSquare in iterSquares(PAWN_ATTACKS[color ^ 1][position.epSquare] & pawns):
+                move = encodeMove(fromSquare, position.epSquare, EMPTY, CAPTURE | EN_PASSANT)
+                if isLegal(position, move): moves.append(move)
+        for fromSquare in iterSquares(boards[base | KNIGHT] & ~pinned):
+            addPieceMoves(moves, fromSquare, KNIGHT_ATTACKS[fromSquare] & notFriends & checkMask,
+                          enemies)
+        for fromSquare in iterSquares(boards[base | BISHOP]):
+            targets = getBishopAttacks(fromSquare, occupied) & notFriends & checkMask
+            addPieceMoves(moves, fromSquare, targets & pinMasks.get(fromSquare, FULL_BOARD), enemies)
+        for fromSquare in iterSquares(boards[base | ROOK]):
+            targets = getRookAttacks(fromSquare, occupied) & notFriends & checkMask
+            addPieceMoves(moves, fromSquare, targets & pinMasks.get(fromSquare, FULL_BOARD), enemies)
+        for fromSquare in iterSquares(boards[base | QUEEN]):
+            targets = getQueenAttacks(fromSquare, occupied) & notFriends & checkMask
+            addPieceMoves(moves, fromSquare, targets & pinMasks.get(fromSquare, FULL_BOARD), enemies)
+    # The king may not step onto an attacked square, looking through its own square
+    kingOccupied = occupied ^ SQUARE_BITS[kingSquare]
+    for toSquare in iterSquares(KING_ATTACKS[kingSquare] & notFriends):
+        if not getAttackers(position, toSquare, color ^ 1, kingOccupied):
+            flags = CAPTURE if SQUARE_BITS[toSquare] & enemies else 0
+            moves.append(encodeMove(kingSquare, toSquare, EMPTY, flags))
+    if not (checkers or capturesOnly): addCastlingMoves(moves, position, color, kingSquare)
+    return moves
+
+def getTargetMask(moves, square):
+    mask = 0
+    for move in moves:
+        if getFromSquare(move) == square: mask |= SQUARE_BITS[getToSquare(move)]
+    return mask
+
+def getPseudoLegalTargets(position, square):
+    return getTargetMask(getPseudoLegalMoves(position, position.squares[square] >> 3), square)
+
+def getLegalTargets(position, square):
+    return getTargetMask(getLegalMoves(position, position.squares[square] >> 3), square)
+
+def getMoveFromUci(position, uci):
+    # Long algebraic move ("e2e4", "e7e8q") to the matching legal move, or NO_MOVE
+    for move in getLegalMoves(position):
+        if moveToUci(move) == uci: return move
+    return NO_MOVE
+
+def getMoveFromSan(position, san):
+    # Standard algebraic move ("Nbd7", "exd5", "e8=Q+", "O-O") to the matching
+    # legal move, or NO_MOVE if it is illegal or ambiguous
+    san = san.rstrip("+#!?")
+    moves = getLegalMoves(position)
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        toCol = 6 if len(san) == 3 else 2
+        matches = [move for move in moves
+                   if (getMoveFlags(move) & CASTLING) and ((getToSquare(move) & 7) == toCol)]
+        return matches[0] if len(matches) == 1 else NO_MOVE
+    pieceType = PAWN
+    if (len(san) > 0) and (san[0] in SAN_PIECES):
+        pieceType = SAN_PIECES.index(san[0])
+        san = san[1:]
+    promotion = EMPTY
+    if (len(san) > 2) and (san[-1] in SAN_PIECES):
+        promotion = SAN_PIECES.index(san[-1])
+        san = san[:-1].rstrip("=")
+    san = san.replace("x", "").replace("-", "")
+    if (len(san) < 2) or (san[-2:] not in SQUARE_NAMES): return NO_MOVE
+    toSquare = squareIndex(san[-2:])
+    # Anything left is the file and/or rank the move comes from
+    fromHint = san[:-2]
+    matches = list()
+    for move in moves:
+        fromSquare = getFromSquare(move)
+        if (getToSquare(move) != toSquare) or (getPromotion(move) != promotion) or \
+           (getPieceType(position.pieceAt(fromSquare)) != pieceType): continue
+        if any(hint not in squareName(fromSquare) for hint in fromHint): continue
+        matches.append(move)
+    return matches[0] if len(matches) == 1 else NO_MOVE
@@ -0,0 +1,53 @@
+# chess [ai] engine
+# Move ordering: hash move, MVV-LVA captures, killer moves and history heuristic
+
+from engine.position import NUM_SQUARES, NO_MOVE, CAPTURE, EN_PASSANT, PAWN, \
+     getPieceType
+
+HASH_MOVE_SCORE   = 1000000
+CAPTURE_SCORE     = 100000
+FIRST_KILLER      = 90000
+SECOND_KILLER     = 80000
+MAX_HISTORY_SCORE = 50000
+MAX_PLY           = 128
+
+class MoveOrderer(object):
+    def __init__(self, pieceValues):
+        # Piece values in centipawns, indexed by engine piece type
+        self.pieceValues = pieceValues
+        self.killers = [[NO_MOVE, NO_MOVE] for ply in range(MAX_PLY)]
+        self.history = [0] * (2 * NUM_SQUARES * NUM_SQUARES)
+    def newSearch(self):
+        self.killers = [[NO_MOVE, NO_MOVE] for ply in range(MAX_PLY)]
+        # Old history still helps but should not outweigh what this search learns
+        self.history = [score // 2 for score in self.history]
+    def scoreMove(self, position, move, hashMove, ply):
+        if move == hashMove: return HASH_MOVE_SCORE
+        flags = move >> 15
+        promotion = (move >> 12) & 7
+        if flags & CAPTURE:
+            # Most valuable victim first; among equal victims, pawns capture before kings
+            victim = PAWN if flags & EN_PASSANT else getPieceType(position.squares[(move >> 6) & 63])
+            attacker = getPieceType(position.squares[move & 63])
+            return CAPTURE_SCORE + 10 * self.pieceValues[victim] - attacker + \
+                   self.pieceValues[promotion]
+        if promotion: return CAPTURE_SCORE + self.pieceValues[promotion]
+        killers = self.killers[ply]
+        if move == killers[0]: return FIRST_KILLER
+        if move == killers[1]: return SECOND_KILLER
+        return self.history[(position.sideToMove << 12) | (move & 4095)]
+    def orderMoves(self, position, moves, hashMove=NO_MOVE, ply=0):
+        ply = min(ply, MAX_PLY-1)
+        moves.sort(key=lambda move: self.scoreMove(position, move, hashMove, ply), reverse=True)
+        return moves
+    def isQuiet(self, move):
+        return not ((move >> 15) & CAPTURE) and not ((move >> 12) & 7)
+    def recordCutoff(self, position, move, depth, ply):
+        # Quiet moves that cause a cutoff become killers and gain history
+        if not self.isQuiet(move): return
+        killers = self.killers[min(ply, MAX_PLY-1)]
+        if move != killers[0]:
+            killers[1] = killers[0]
+            killers[0] = move
+        index = (position.sideToMove << 12) | (move & 4095)
+        self.history[index] = min(MAX_HISTORY_SCORE, self.history[index] + depth * depth)
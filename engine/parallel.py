@@ -0,0 +1,192 @@
+# chess [ai] engine
+# Root-splitting search over a process pool: every worker process searches a share
+# of the root moves with its own transposition table, so the GIL does not serialize them
+
+import multiprocessing
+import time
+from engine.position import Position, NO_MOVE
+from engine.movegen import getLegalMoves, isInCheck
+from engine.search import MinimaxAgent, SearchTimeout, SIDE_SIGNS, INFINITE_SCORE, \
+     LMR_MIN_DEPTH, LMR_MIN_MOVES
+from engine.tablebase import Tablebase
+
+# How often the main process checks for "stop" and the deadline (seconds)
+POLL_INTERVAL = 0.005
+
+# Workers are spawned, not forked: forking from a search thread while another
+# thread holds a lock (such as the UCI loop reading stdin) deadlocks the child
+POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+# Agent of the current worker process, created by initializeWorker
+workerAgent = None
+
+class WorkerAgent(MinimaxAgent):
+    # Searches root moves for a ParallelAgent; stops when the shared event is set
+    def __init__(self, hashSizeMb, stopEvent):
+        MinimaxAgent.__init__(self, 1, None, hashSizeMb)
+        self.stopEvent = stopEvent
+        self.searchId = None
+    def countNode(self):
+        if ((self.nodes & 255) == 255) and self.stopEvent.is_set(): self.stopped = True
+        MinimaxAgent.countNode(self)
+
+def initializeWorker(hashSizeMb, stopEvent, syzygyPath, pruning, ready):
+    global workerAgent
+    workerAgent = WorkerAgent(hashSizeMb, stopEvent)
+    workerAgent.nullMove, workerAgent.lateMoveReductions, workerAgent.futility = pruning
+    if syzygyPath != None: workerAgent.tablebase = Tablebase(syzygyPath)
+    ready.release()
+
+def searchRootMoves(searchId, fen, moves, indices, depth, deadline, alpha=-INFINITE_SCORE):
+    # Returns (nodes, scores, best move, pv) for this share of the root moves with
+    # scores from the side to move, or (nodes, None, NO_MOVE, []) if the search
+    # was stopped before it finished. indices are the moves' places in the root
+    # move order. Given the score of the first root move as alpha, the best move
+    # stays NO_MOVE unless one beats it.
+    agent = workerAgent
+    if agent.searchId != searchId:
+        agent.searchId = searchId
+        agent.table.newSearch()
+        agent.orderer.newSearch()
+    agent.searchDepth = depth
+    agent.deadline = deadline
+    agent.stopped = False
+    agent.nodes = 0
+    position = Position.fromFen(fen)
+    beta = INFINITE_SCORE
+    # Late root moves are reduced exactly as MinimaxAgent.negamax reduces them
+    reduceLateMoves = agent.lateMoveReductions and (depth >= LMR_MIN_DEPTH) and \
+                      (not isInCheck(position))
+    scores = list()
+    bestMove = NO_MOVE
+    pv = list()
+    try:
+        for index, move in zip(indices, moves):
+            childPv = list()
+            quiet = agent.orderer.isQuiet(move)
+            position.makeMove(move)
+            reduction = 0
+            if reduceLateMoves and (index >= LMR_MIN_MOVES) and quiet and (not isInCheck(position)):
+                reduction = agent.getReduction(index, depth)
+            score = agent.searchMove(position, depth, 0, alpha, beta, index, reduction, childPv)
+            position.unmakeMove()
+            scores.append(score)
+            if score > alpha:
+                alpha = score
+                bestMove = move
+                pv = [move] + childPv
+    except SearchTimeout:
+        return agent.nodes, None, NO_MOVE, list()
+    return agent.nodes, scores, bestMove, pv
+
+class ParallelAgent(MinimaxAgent):
+    # A MinimaxAgent whose search() splits the root moves over worker processes.
+    # Each iteration first searches the best move of the last iteration, then hands
+    # out the others round-robin in score order with its score as alpha, so the
+    # workers only have to prove that their moves are not better.
+    def __init__(self, maxDepth, color, hashSizeMb=16, timeMs=None, seed=None, workers=None):
+        MinimaxAgent.__init__(self, maxDepth, color, hashSizeMb, timeMs, seed)
+        self.workers = multiprocessing.cpu_count() if workers == None else max(1, workers)
+        self.hashSizeMb = hashSizeMb
+        self.pool = None
+        self.stopEvent = None
+        self.searchCount = 0
+    def startPool(self):
+        # Workers open their own tablebase and copy the pruning switches, so set
+        # those before the first search
+        if self.pool != None: return
+        self.stopEvent = POOL_CONTEXT.Event()
+        syzygyPath = None if self.tablebase == None else self.tablebase.directory
+        pruning = (self.nullMove, self.lateMoveReductions, self.futility)
+        ready = POOL_CONTEXT.Semaphore(0)
+        self.pool = POOL_CONTEXT.Pool(self.workers, initializeWorker,
+                                      (self.hashSizeMb, self.stopEvent, syzygyPath, pruning, ready))
+        # Spawned workers take a while to import the engine; wait for all of them
+        # so the first search does not pay for it
+        for worker in range(self.workers): ready.acquire()
+    def close(self):
+        if self.pool == None: return
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+    def setHashSize(self, hashSizeMb):
+        # Each worker has its own table of this size, so the pool is restarted
+        MinimaxAgent.setHashSize(self, hashSizeMb)
+        self.hashSizeMb = hashSizeMb
+        if self.pool != None:
+            self.close()
+            self.startPool()
+    def search(self, position, timeMs=None, maxDepth=None, report=None):
+        self.principalVariation = list()
+        allLegalMoves = getLegalMoves(position)
+        if len(allLegalMoves) == 0: return NO_MOVE
+        if len(allLegalMoves) == 1: return allLegalMoves[0]
+        bookMove = self.getBookMove(position)
+        if bookMove != NO_MOVE: return bookMove
+        tablebaseMove = self.getTablebaseMove(position)
+        if tablebaseMove != NO_MOVE: return tablebaseMove
+        timeMs = self.timeMs if timeMs == None else timeMs
+        maxDepth = self.maxDepth if maxDepth == None else maxDepth
+        self.startPool()
+        self.startTime = time.time()
+        self.deadline = None if timeMs == None else self.startTime + timeMs / 1000
+        self.searchCount += 1
+        self.nodes = 0
+        fen = position.toFen()
+        sign = SIDE_SIGNS[position.sideToMove]
+        self.random.shuffle(allLegalMoves)
+        self.orderer.orderMoves(position, allLegalMoves)
+        selectedMove = NO_MOVE
+        for depth in range(1, maxDepth+1):
+            self.searchDepth = depth
+            first = self.pool.apply_async(searchRootMoves,
+                                          (self.searchCount, fen, allLegalMoves[:1], [0], depth,
+                                           self.deadline))
+            # Depth one always completes so there is a move to play
+            self.waitForResults([first], depth > 1)
+            nodes, firstScores, bestMove, pv = first.get()
+            self.nodes += nodes
+            if firstScores == None: break
+            bestScore = firstScores[0]
+            indices = [list(range(1 + worker, len(allLegalMoves), self.workers))
+                       for worker in range(self.workers)]
+            indices = [share for share in indices if len(share) > 0]
+            shares = [[allLegalMoves[index] for index in share] for share in indices]
+            results = [self.pool.apply_async(searchRootMoves,
+                                             (self.searchCount, fen, share, shareIndices, depth,
+                                              self.deadline, bestScore))
+                       for share, shareIndices in zip(shares, indices)]
+            self.waitForResults(results, depth > 1)
+            results = [result.get() for result in results]
+            self.nodes += sum(result[0] for result in results)
+            if any(shareScores == None for nodes, shareScores, shareMove, sharePv in results): break
+            scores = {bestMove: bestScore}
+            for share, (nodes, shareScores, shareMove, sharePv) in zip(shares, results):
+                scores.update(zip(share, shareScores))
+                if (shareMove != NO_MOVE) and (scores[shareMove] > bestScore):
+                    bestScore = scores[shareMove]
+                    bestMove = shareMove
+                    pv = sharePv
+            selectedMove = bestMove
+            self.principalVariation = pv
+            allLegalMoves.sort(key=lambda move: -scores[move])
+            if report != None: report(depth, sign * bestScore, pv)
+            if self.stopped: break
+            # The next depth takes longer than all previous ones together
+            if (self.deadline != None) and \
+               (time.time() - self.startTime > (self.deadline - self.startTime) / 2): break
+        return selectedMove
+    def waitForResults(self, results, canStop):
+        # Tell the workers to stop on "stop" or at the deadline, then wait for
+        # all of them so the next iteration starts with idle workers
+        pending = [result for result in results if not result.ready()]
+        while len(pending) > 0:
+            if canStop and (self.stopped or \
+               ((self.deadline != None) and (time.time() > self.deadline))):
+                self.stopEvent.set()
+                for result in pending: result.wait()
+                self.stopEvent.clear()
+                return
+            # Block on a result that is still running, so the wait does not spin
+            pending[0].wait(POLL_INTERVAL)
+            pending = [result for result in pending if not result.ready()]
@@ -0,0 +1,122 @@
+# chess [ai] engine
+# Perft: count leaf nodes of the legal move tree to check the move generator
+# python -m engine.perft [--fen FEN] [--depth N] [--divide]
+
+import argparse
+import sys
+import time
+from engine.position import Position, START_FEN, moveToUci
+from engine.movegen import getLegalMoves
+from engine.game import GameState
+
+# Standard perft positions with known node counts, indexed by depth - 1, and the
+# depth the suite runs to by default
+PERFT_SUITE = [
+    ("start position", START_FEN,
+     [20, 400, 8902, 197281, 4865609], 4),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603], 3),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624, 11030083], 5),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333], 4),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487], 3),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594], 3)]
+
+# FENs that must come back unchanged through GameState.fromFen and toFen; the
+# last has a black pawn off its start rank that is not capturable en passant
+FEN_ROUND_TRIPS = [fen for name, fen, counts, suiteDepth in PERFT_SUITE] + [
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+    "4k3/8/8/3pP3/8/8/8/4K3 w - - 0 1"]
+
+def perft(position, depth):
+    if depth == 0: return 1
+    moves = getLegalMoves(position)
+    # Bulk counting: the last ply only needs the number of legal moves
+    if depth == 1: return len(moves)
+    nodes = 0
+    for move in moves:
+        position.makeMove(move)
+        nodes += perft(position, depth-1)
+        position.unmakeMove()
+    return nodes
+
+def divide(position, depth):
+    # Node count below each root move, for finding where two generators disagree
+    counts = list()
+    for move in getLegalMoves(position):
+        position.makeMove(move)
+        counts.append((moveToUci(move), perft(position, depth-1)))
+        position.unmakeMove()
+    return counts
+
+def getNodesPerSecond(nodes, seconds):
+    return int(nodes / seconds) if seconds > 0 else 0
+
+def runDivide(fen, depth, output=sys.stdout):
+    startTime = time.time()
+    counts = divide(Position.fromFen(fen), depth)
+    seconds = time.time() - startTime
+    for uci, nodes in sorted(counts):
+        output.write(f"{uci}: {nodes}\n")
+    total = sum(nodes for uci, nodes in counts)
+    output.write(f"\nmoves {len(counts)} nodes {total} time {seconds:.2f}s "
+                 f"nps {getNodesPerSecond(total, seconds)}\n")
+    return total
+
+def runSuite(maxDepth=None, output=sys.stdout):
+    # Returns True when every count matches
+    passed = True
+    totalNodes = 0
+    totalSeconds = 0
+    for name, fen, counts, suiteDepth in PERFT_SUITE:
+        depth = suiteDepth if maxDepth == None else min(maxDepth, len(counts))
+        position = Position.fromFen(fen)
+        startTime = time.time()
+        nodes = perft(position, depth)
+        seconds = time.time() - startTime
+        totalNodes += nodes
+        totalSeconds += seconds
+        result = "ok" if nodes == counts[depth-1] else f"FAIL (expected {counts[depth-1]})"
+        if nodes != counts[depth-1]: passed = False
+        output.write(f"{name:<15} depth {depth} nodes {nodes:>9} time {seconds:6.2f}s "
+                     f"nps {getNodesPerSecond(nodes, seconds):>8} {result}\n")
+    output.write(f"{'total':<15} {'':7} nodes {totalNodes:>9} time {totalSeconds:6.2f}s "
+                 f"nps {getNodesPerSecond(totalNodes, totalSeconds):>8}\n")
+    return passed
+
+def runFenRoundTrips(output=sys.stdout):
+    # Returns True when every FEN survives the round trip
+    passed = True
+    for fen in FEN_ROUND_TRIPS:
+        result = GameState.fromFen(fen).toFen()
+        if result != fen:
+            output.write(f"FEN round trip FAIL: {fen} -> {result}\n")
+            passed = False
+    output.write(f"FEN round trips {'ok' if passed else 'FAIL'}\n")
+    return passed
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Move generator perft counts")
+    parser.add_argument("--fen", help="position to count (default: run the bundled suite)")
+    parser.add_argument("--depth", type=int, help="search depth")
+    parser.add_argument("--divide", action="store_true", help="show the count below each root move")
+    options = parser.parse_args(args)
+    if (options.fen == None) and (not options.divide):
+        passed = runSuite(options.depth)
+        return 0 if runFenRoundTrips() and passed else 1
+    fen = START_FEN if options.fen == None else options.fen
+    depth = 1 if options.depth == None else options.depth
+    if options.divide:
+        runDivide(fen, depth)
+    else:
+        startTime = time.time()
+        nodes = perft(Position.fromFen(fen), depth)
+        seconds = time.time() - startTime
+        print(f"nodes {nodes} time {seconds:.2f}s nps {getNodesPerSecond(nodes, seconds)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+# chess [ai] engine
+# Compact board representation used by the AI search
+
+from engine.zobrist import PIECE_KEYS, CASTLING_KEYS, EP_FILE_KEYS, SIDE_KEY, \
+     getPositionKey
+from engine.evaluate import MG_TABLES, EG_TABLES, PHASE_WEIGHTS
+
+# Squares are integers 0..63 laid out like the board grid: square = row * 8 + col,
+# with row 0 being rank 8 (so a8 = 0, h8 = 7, a1 = 56, h1 = 63)
+BOARD_DIM    = 8
+NUM_SQUARES  = BOARD_DIM * BOARD_DIM
+START_LETTER = "a"
+NO_SQUARE    = -1
+
+WHITE = 0
+BLACK = 1
+
+# Piece codes are small ints: piece type in the low three bits, color in bit 3
+EMPTY  = 0
+PAWN   = 1
+KNIGHT = 2
+BISHOP = 3
+ROOK   = 4
+QUEEN  = 5
+KING   = 6
+
+WHITE_KINGSIDE  = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE  = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLING    = 15
+
+# FEN castling letters, in flag order
+CASTLING_CHARS = "KQkq"
+START_FEN      = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+COLOR_NAMES = ["white", "black"]
+PIECE_NAMES = ["", "pawn", "knight", "bishop", "rook", "queen", "king"]
+PIECE_TYPES = {name: pieceType for pieceType, name in enumerate(PIECE_NAMES) if name}
+PIECE_CHARS = ".pnbrqk"
+
+def makePiece(color, pieceType):
+    return pieceType | (color << 3)
+
+def getPieceColor(piece):
+    return piece >> 3
+
+def getPieceType(piece):
+    return piece & 7
+
+def getRow(square):
+    return square >> 3
+
+def getCol(square):
+    return square & 7
+
+def getSquareIndex(row, col):
+    return row * BOARD_DIM + col
+
+# Algebraic name ("e2") to square index
+def squareIndex(name):
+    row = BOARD_DIM - int(name[1])
+    col = ord(name[0]) - ord(START_LETTER)
+    return getSquareIndex(row, col)
+
+# Square index to algebraic name
+SQUARE_NAMES = [chr(ord(START_LETTER) + (sq & 7)) + str(BOARD_DIM - (sq >> 3))
+                for sq in range(NUM_SQUARES)]
+
+def squareName(square):
+    return SQUARE_NAMES[square]
+
+def getPieceChar(piece):
+    char = PIECE_CHARS[getPieceType(piece)]
+    return char.upper() if getPieceColor(piece) == WHITE else char
+
+# Moves are packed into ints: from | to << 6 | promotion << 12 | flags << 15
+CAPTURE     = 1
+DOUBLE_PUSH = 2
+EN_PASSANT  = 4
+CASTLING    = 8
+
+NO_MOVE = 0
+
+def encodeMove(fromSquare, toSquare, promotion=EMPTY, flags=0):
+    return fromSquare | (toSquare << 6) | (promotion << 12) | (flags << 15)
+
+def getFromSquare(move):
+    return move & 63
+
+def getToSquare(move):
+    return (move >> 6) & 63
+
+def getPromotion(move):
+    return (move >> 12) & 7
+
+def getMoveFlags(move):
+    return move >> 15
+
+def moveToUci(move):
+    uci = squareName(getFromSquare(move)) + squareName(getToSquare(move))
+    if getPromotion(move): uci += PIECE_CHARS[getPromotion(move)]
+    return uci
+
+START_LAYOUT = [ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK]
+
+# Rook move for each castling king destination
+CASTLING_ROOKS = {squareIndex("g1"): (squareIndex("h1"), squareIndex("f1")),
+                  squareIndex("c1"): (squareIndex("a1"), squareIndex("d1")),
+                  squareIndex("g8"): (squareIndex("h8"), squareIndex("f8")),
+                  squareIndex("c8"): (squareIndex("a8"), squareIndex("d8"))}
+
+# Castling rights kept when a move touches a square (king and rook homes)
+CASTLING_MASKS = [ALL_CASTLING] * NUM_SQUARES
+CASTLING_MASKS[squareIndex("e1")] ^= WHITE_KINGSIDE | WHITE_QUEENSIDE
+CASTLING_MASKS[squareIndex("h1")] ^= WHITE_KINGSIDE
+CASTLING_MASKS[squareIndex("a1")] ^= WHITE_QUEENSIDE
+CASTLING_MASKS[squareIndex("e8")] ^= BLACK_KINGSIDE | BLACK_QUEENSIDE
+CASTLING_MASKS[squareIndex("h8")] ^= BLACK_KINGSIDE
+CASTLING_MASKS[squareIndex("a8")] ^= BLACK_QUEENSIDE
+
+class Position(object):
+    def __init__(self):
+        self.squares = [EMPTY] * NUM_SQUARES
+        # Bitboards by piece code and by color, kept in sync with squares
+        self.pieceBoards = [0] * 16
+        self.colorBoards = [0, 0]
+        self.occupied = 0
+        self.kingSquares = [NO_SQUARE, NO_SQUARE]
+        self.sideToMove = WHITE
+        self.castling = 0
+        self.epSquare = NO_SQUARE
+        self.halfmoveClock = 0
+        self.fullmoveNumber = 1
+        # Material plus piece-square scores (white positive) and game phase
+        self.mgScore = 0
+        self.egScore = 0
+        self.phase = 0
+        # Zobrist key, updated incrementally by putPiece/removePiece/makeMove
+        self.key = 0
+        # Undo entries: (move, captured piece, castling, en passant, halfmove clock, key)
+        self.history = list()
+    @classmethod
+    def startPosition(cls):
+        position = cls()
+        for col in range(BOARD_DIM):
+            position.putPiece(getSquareIndex(0, col), makePiece(BLACK, START_LAYOUT[col]))
+            position.putPiece(getSquareIndex(1, col), makePiece(BLACK, PAWN))
+            position.putPiece(getSquareIndex(6, col), makePiece(WHITE, PAWN))
+            position.putPiece(getSquareIndex(7, col), makePiece(WHITE, START_LAYOUT[col]))
+        position.castling = ALL_CASTLING
+        position.refreshKey()
+        return position
+    @classmethod
+    def fromFen(cls, fen):
+        # Missing trailing fields default to white to move, no rights, clocks 0 1
+        fields = fen.split()
+        rows = fields[0].split("/") if fields else list()
+        if len(rows) != BOARD_DIM: raise ValueError(f"invalid FEN: {fen}")
+        position = cls()
+        for row, rowText in enumerate(rows):
+            col = 0
+            for char in rowText:
+                if char.isdigit():
+                    col += int(char)
+                elif (char.lower() in PIECE_CHARS[1:]) and (col < BOARD_DIM):
+                    color = WHITE if char.isupper() else BLACK
+                    pieceType = PIECE_CHARS.index(char.lower())
+                    position.putPiece(getSquareIndex(row, col), makePiece(color, pieceType))
+                    col += 1
+                else: raise ValueError(f"invalid FEN: {fen}")
+            if col != BOARD_DIM: raise ValueError(f"invalid FEN: {fen}")
+        fields += ["w", "-", "-", "0", "1"][len(fields)-1:]
+        if fields[1] not in ("w", "b"): raise ValueError(f"invalid FEN: {fen}")
+        position.sideToMove = WHITE if fields[1] == "w" else BLACK
+        for flag, char in enumerate(CASTLING_CHARS):
+            if char in fields[2]: position.castling |= 1 << flag
+        if fields[3] in SQUARE_NAMES: position.epSquare = squareIndex(fields[3])
+        elif fields[3] != "-": raise ValueError(f"invalid FEN: {fen}")
+        position.halfmoveClock = int(fields[4])
+        position.fullmoveNumber = int(fields[5])
+        position.refreshKey()
+        return position
+    def toFen(self):
+        rows = list()
+        for row in range(BOARD_DIM):
+            rowText = ""
+            emptySquares = 0
+            for col in range(BOARD_DIM):
+                piece = self.squares[getSquareIndex(row, col)]
+                if piece == EMPTY:
+                    emptySquares += 1
+                    continue
+                if emptySquares: rowText += str(emptySquares)
+                emptySquares = 0
+                rowText += getPieceChar(piece)
+            if emptySquares: rowText += str(emptySquares)
+            rows.append(rowText)
+        side = "w" if self.sideToMove == WHITE else "b"
+        castling = "".join(char for flag, char in enumerate(CASTLING_CHARS)
+                           if self.castling & (1 << flag))
+        epSquare = squareName(self.epSquare) if self.epSquare != NO_SQUARE else "-"
+        return f"{'/'.join(rows)} {side} {castling or '-'} {epSquare} " \
+               f"{self.halfmoveClock} {self.fullmoveNumber}"
+    def __repr__(self):
+        rows = list()
+        for row in range(BOARD_DIM):
+            rowChars = list()
+            for col in range(BOARD_DIM):
+                piece = self.squares[getSquareIndex(row, col)]
+                rowChars.append(getPieceChar(piece) if piece else ".")
+            rows.append(" ".join(rowChars))
+        return "\n".join(rows)
+    def copy(self):
+        other = Position()
+        other.squares = self.squares[:]
+        other.pieceBoards = self.pieceBoards[:]
+        other.colorBoards = self.colorBoards[:]
+        other.occupied = self.occupied
+        other.kingSquares = self.kingSquares[:]
+        other.sideToMove = self.sideToMove
+        other.castling = self.castling
+        other.epSquare = self.epSquare
+        other.halfmoveClock = self.halfmoveClock
+        other.fullmoveNumber = self.fullmoveNumber
+        other.mgScore = self.mgScore
+        other.egScore = self.egScore
+        other.phase = self.phase
+        other.key = self.key
+        other.history = self.history[:]
+        return other
+    def refreshKey(self):
+        # Recompute the key after setting up side, castling or en passant directly
+        if (self.epSquare != NO_SQUARE) and \
+           (not self.canCaptureEnPassant(self.epSquare, self.sideToMove)):
+                self.epSquare = NO_SQUARE
+        self.key = getPositionKey(self)
+    def canCaptureEnPassant(self, epSquare, color):
+        # The en passant square is only kept (and hashed) when a pawn of color
+        # stands beside the pawn that skipped it, as in Polyglot keys, so that
+        # transpositions through a double push get the same key
+        pawnSquare = epSquare + (8 if color == WHITE else -8)
+        if not (0 <= pawnSquare < NUM_SQUARES): return False
+        pawn = makePiece(color, PAWN)
+        col = pawnSquare & 7
+        return ((col > 0) and (self.squares[pawnSquare-1] == pawn)) or \
+               ((col < BOARD_DIM-1) and (self.squares[pawnSquare+1] == pawn))
+    def pieceAt(self, square):
+        return self.squares[square]
+    def isEmpty(self, square):
+        return self.squares[square] == EMPTY
+    def getPieces(self, color, pieceType):
+        return self.pieceBoards[makePiece(color, pieceType)]
+    def putPiece(self, square, piece):
+        bit = 1 << square
+        self.squares[square] = piece
+        self.pieceBoards[piece] |= bit
+        self.colorBoards[piece >> 3] |= bit
+        self.occupied |= bit
+        self.key ^= PIECE_KEYS[piece][square]
+        self.mgScore += MG_TABLES[piece][square]
+        self.egScore += EG_TABLES[piece][square]
+        self.phase += PHASE_WEIGHTS[piece & 7]
+        if getPieceType(piece) == KING:
+            self.kingSquares[getPieceColor(piece)] = square
+    def removePiece(self, square):
+        bit = 1 << square
+        piece = self.squares[square]
+        self.squares[square] = EMPTY
+        self.pieceBoards[piece] ^= bit
+        self.colorBoards[piece >> 3] ^= bit
+        self.occupied ^= bit
+        self.key ^= PIECE_KEYS[piece][square]
+        self.mgScore -= MG_TABLES[piece][square]
+        self.egScore -= EG_TABLES[piece][square]
+        self.phase -= PHASE_WEIGHTS[piece & 7]
+        return piece
+    def getPieceSquares(self, color):
+        return [sq for sq in range(NUM_SQUARES) if self.colorBoards[color] & (1 << sq)]
+    def makeMove(self, move):
+        fromSquare = move & 63
+        toSquare = (move >> 6) & 63
+        promotion = (move >> 12) & 7
+        flags = move >> 15
+        color = self.sideToMove
+        previousKey = self.key
+        captured = EMPTY
+        if flags & EN_PASSANT:
+            captured = self.removePiece(toSquare + (8 if color == WHITE else -8))
+        elif flags & CAPTURE:
+            captured = self.removePiece(toSquare)
+        self.history.append((move, captured, self.castling, self.epSquare,
+                             self.halfmoveClock, previousKey))
+        piece = self.removePiece(fromSquare)
+        if promotion: self.putPiece(toSquare, makePiece(color, promotion))
+        else: self.putPiece(toSquare, piece)
+        if flags & CASTLING:
+            rookFrom, rookTo = CASTLING_ROOKS[toSquare]
+            self.putPiece(rookTo, self.removePiece(rookFrom))
+        self.key ^= CASTLING_KEYS[self.castling]
+        self.castling &= CASTLING_MASKS[fromSquare] & CASTLING_MASKS[toSquare]
+        self.key ^= CASTLING_KEYS[self.castling]
+        if self.epSquare != NO_SQUARE: self.key ^= EP_FILE_KEYS[self.epSquare & 7]
+        self.epSquare = NO_SQUARE
+        if (flags & DOUBLE_PUSH) and self.canCaptureEnPassant((fromSquare + toSquare) >> 1, color ^ 1):
+            self.epSquare = (fromSquare + toSquare) >> 1
+        if self.epSquare != NO_SQUARE: self.key ^= EP_FILE_KEYS[self.epSquare & 7]
+        if captured or (getPieceType(piece) == PAWN): self.halfmoveClock = 0
+        else: self.halfmoveClock += 1
+        if color == BLACK: self.fullmoveNumber += 1
+        self.sideToMove = color ^ 1
+        self.key ^= SIDE_KEY
+    def makeNullMove(self):
+        # Pass the turn without moving (null move pruning); undone by unmakeMove
+        self.history.append((NO_MOVE, EMPTY, self.castling, self.epSquare,
+                             self.halfmoveClock, self.key))
+        if self.epSquare != NO_SQUARE: self.key ^= EP_FILE_KEYS[self.epSquare & 7]
+        self.epSquare = NO_SQUARE
+        self.halfmoveClock += 1
+        self.sideToMove ^= 1
+        self.key ^= SIDE_KEY
+    def unmakeMove(self):
+        move, captured, castling, epSquare, halfmoveClock, key = self.history.pop()
+        if move == NO_MOVE:
+            self.sideToMove ^= 1
+            self.epSquare = epSquare
+            self.halfmoveClock = halfmoveClock
+            self.key = key
+            return
+        fromSquare = move & 63
+        toSquare = (move >> 6) & 63
+        flags = move >> 15
+        color = self.sideToMove ^ 1
+        self.sideToMove = color
+        if color == BLACK: self.fullmoveNumber -= 1
+        piece = self.removePiece(toSquare)
+        if (move >> 12) & 7: piece = makePiece(color, PAWN)
+        self.putPiece(fromSquare, piece)
+        if flags & CASTLING:
+            rookFrom, rookTo = CASTLING_ROOKS[toSquare]
+            self.putPiece(rookFrom, self.removePiece(rookTo))
+        if flags & EN_PASSANT:
+            self.putPiece(toSquare + (8 if color == WHITE else -8), captured)
+        elif captured:
+            self.putPiece(toSquare, captured)
+        self.castling = castling
+        self.epSquare = epSquare
+        self.halfmoveClock = halfmoveClock
+        self.key = key
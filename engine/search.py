@@ -0,0 +1,324 @@
+# chess [ai] engine
+# Minimax search with alpha-beta pruning over engine positions
+
+import random
+import threading
+import time
+from engine.position import PAWN, KING, NO_MOVE, getPieceType, getToSquare, \
+     getPromotion, getMoveFlags, CAPTURE, EN_PASSANT
+from engine.movegen import getLegalMoves, isInCheck
+from engine.evaluate import PIECE_VALUES, MATE_SCORE, MATE_BOUND, evaluate, \
+     getTerminalScore, scoreToTable, scoreFromTable
+from engine.ordering import MoveOrderer
+from engine.tt import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, DEPTH, \
+     SCORE, BOUND, MOVE
+
+MAX_SEARCH_DEPTH = 32
+
+# Scores are from the side to move, so white scores are multiplied by these
+SIDE_SIGNS = [1, -1]
+INFINITE_SCORE = MATE_SCORE + 1
+
+# Aspiration windows around the previous iteration's score (centipawns)
+ASPIRATION_WINDOW    = 50
+ASPIRATION_MIN_DEPTH = 3
+
+# Selective search; each technique can be switched off per agent
+NULL_MOVE_REDUCTION     = 2
+NULL_MOVE_MIN_DEPTH     = 3
+NULL_MOVE_DEEP          = 6
+LMR_MIN_DEPTH           = 3
+LMR_MIN_MOVES           = 3
+LMR_LATE_MOVES          = 6
+FUTILITY_DEPTH          = 3
+FUTILITY_MARGINS        = [0, 150, 300, 500]
+REVERSE_FUTILITY_MARGIN = 120
+
+# Quiescence search limits
+DELTA_MARGIN          = 200
+QUIESCENCE_MAX_DEPTH  = 8
+QUIESCENCE_CHECK_PLY  = 2
+QUIESCENCE_NODE_LIMIT = 2000
+
+def hasPieces(position, color):
+    # Anything besides pawns and the king
+    return (position.colorBoards[color] & ~(position.getPieces(color, PAWN) |
+            position.getPieces(color, KING))) != 0
+
+class SearchTimeout(Exception):
+    pass
+
+class SearchHandle(object):
+    # A search running in a worker thread; poll isDone() instead of blocking
+    def __init__(self, agent, position, timeMs=None):
+        self.agent = agent
+        self.bestMove = NO_MOVE
+        self.completedDepth = 0
+        self.thread = threading.Thread(target=self.run, args=(position, timeMs))
+        self.thread.daemon = True
+        self.thread.start()
+    def run(self, position, timeMs):
+        self.bestMove = self.agent.search(position, timeMs, report=self.recordDepth)
+    def recordDepth(self, depth, score, pv):
+        self.completedDepth = depth
+    def isDone(self):
+        return not self.thread.is_alive()
+    def getNodes(self):
+        return self.agent.nodes
+    def cancel(self):
+        # Stops at the next node check; the agent can be reused afterwards
+        self.agent.stopped = True
+        self.thread.join()
+        self.agent.stopped = False
+
+# Algorithm inspired by: https://towardsdatascience.com/create-ai-for-your-own-board-game-from-scratch-minimax-part-2-517e1c1e3362
+class MinimaxAgent():
+    def __init__(self, maxDepth, color, hashSizeMb=16, timeMs=None, seed=None):
+        self.maxDepth = maxDepth
+        self.color = color
+        self.timeMs = timeMs
+        # A fixed seed makes the root move order, and so the search, repeatable
+        self.random = random.Random(seed)
+        # Kept between moves so positions searched last turn are remembered
+        self.table = TranspositionTable(hashSizeMb)
+        self.orderer = MoveOrderer(PIECE_VALUES)
+        self.searchDepth = maxDepth
+        self.deadline = None
+        self.startTime = 0
+        # Set from another thread to end the current search early
+        self.stopped = False
+        self.nodes = 0
+        self.quiescenceNodes = 0
+        # Best line of the last completed depth, empty until a search has one
+        self.principalVariation = list()
+        # Selective search techniques, switchable to measure their effect
+        self.nullMove = True
+        self.lateMoveReductions = True
+        self.futility = True
+        # Optional OpeningBook; book moves are played without searching
+        self.book = None
+        # Optional Tablebase, probed at the root and at every node with few pieces
+        self.tablebase = None
+    def chooseMove(self, game, timeMs=None):
+        # Pick a move for a GameState; returns (chess piece, square name)
+        position = game.getPosition(self.color)
+        return game.getPieceMove(self.search(position, timeMs))
+    def setHashSize(self, hashSizeMb):
+        self.table.resize(hashSizeMb)
+    def startSearch(self, position, timeMs=None):
+        # Search in a worker thread and return a SearchHandle to poll
+        return SearchHandle(self, position, timeMs)
+    def search(self, position, timeMs=None, maxDepth=None, report=None):
+        # Search an engine position with make/unmake instead of copying boards;
+        # report(depth, score, pv) is called after each completed depth with a
+        # white positive score
+        self.principalVariation = list()
+        allLegalMoves = getLegalMoves(position)
+        if len(allLegalMoves) == 0: return NO_MOVE
+        if len(allLegalMoves) == 1: return allLegalMoves[0]
+        bookMove = self.getBookMove(position)
+        if bookMove != NO_MOVE: return bookMove
+        tablebaseMove = self.getTablebaseMove(position)
+        if tablebaseMove != NO_MOVE: return tablebaseMove
+        timeMs = self.timeMs if timeMs == None else timeMs
+        maxDepth = self.maxDepth if maxDepth == None else maxDepth
+        self.startTime = time.time()
+        self.deadline = None if timeMs == None else self.startTime + timeMs / 1000
+        self.table.newSearch()
+        self.orderer.newSearch()
+        self.nodes = 0
+        rootPly = len(position.history)
+        sign = SIDE_SIGNS[position.sideToMove]
+        score = 0
+        selectedMove = NO_MOVE
+        # Iterative deepening: keep the move from the last completed depth
+        for depth in range(1, maxDepth+1):
+            self.searchDepth = depth
+            try:
+                score, pv = self.aspirationSearch(position, depth, score)
+            except SearchTimeout:
+                while len(position.history) > rootPly: position.unmakeMove()
+                break
+            selectedMove = pv[0]
+            self.principalVariation = pv
+            if report != None: report(depth, sign * score, pv)
+            if self.stopped: break
+            # The next depth takes longer than all previous ones together
+            if (self.deadline != None) and \
+               (time.time() - self.startTime > (self.deadline - self.startTime) / 2): break
+        return selectedMove
+    def aspirationSearch(self, position, depth, previousScore):
+        # Search a narrow window around the last iteration's score and widen it
+        # on the side that failed; returns (score, pv) for the side to move
+        delta = ASPIRATION_WINDOW
+        alpha, beta = -INFINITE_SCORE, INFINITE_SCORE
+        if (depth >= ASPIRATION_MIN_DEPTH) and (abs(previousScore) < MATE_BOUND):
+            alpha = max(previousScore - delta, -INFINITE_SCORE)
+            beta  = min(previousScore + delta, INFINITE_SCORE)
+        while True:
+            pv = list()
+            score = self.negamax(position, depth, 0, alpha, beta, pv)
+            if (score <= alpha) and (alpha > -INFINITE_SCORE):
+                alpha = max(score - delta, -INFINITE_SCORE)
+            elif (score >= beta) and (beta < INFINITE_SCORE):
+                beta = min(score + delta, INFINITE_SCORE)
+            else:
+                return score, pv
+            delta *= 2
+    def getBookMove(self, position):
+        if self.book == None: return NO_MOVE
+        return self.book.chooseMove(position, self.random)
+    def getTablebaseMove(self, position):
+        if self.tablebase == None: return NO_MOVE
+        move = self.tablebase.getRootMove(position)
+        return NO_MOVE if move == None else move
+    def countNode(self):
+        self.nodes += 1
+        # Depth one always completes so there is a move to play
+        if (self.searchDepth > 1) and ((self.nodes & 255) == 0) and (self.stopped or \
+           ((self.deadline != None) and (time.time() > self.deadline))):
+                raise SearchTimeout()
+    def quiescence(self, position, alpha, beta, ply, qDepth):
+        # Search captures only until the position is quiet, so leaves are not
+        # evaluated in the middle of an exchange
+        self.countNode()
+        self.quiescenceNodes += 1
+        inCheck = isInCheck(position)
+        if inCheck:
+            # Checkmate has no stand pat, even past the plies where evasions are searched
+            allMoves = getLegalMoves(position)
+            if len(allMoves) == 0: return getTerminalScore(True, ply)
+        evasions = inCheck and (qDepth < QUIESCENCE_CHECK_PLY)
+        standPat = SIDE_SIGNS[position.sideToMove] * evaluate(position)
+        if not evasions:
+            if standPat >= beta: return standPat
+            alpha = max(alpha, standPat)
+            if (qDepth >= QUIESCENCE_MAX_DEPTH) or \
+               (self.quiescenceNodes >= QUIESCENCE_NODE_LIMIT):
+                    return standPat
+        if not inCheck:
+            allMoves = getLegalMoves(position, capturesOnly=True)
+        elif not evasions:
+            # The same moves getLegalMoves(capturesOnly=True) would generate
+            allMoves = [move for move in allMoves
+                        if (getMoveFlags(move) & CAPTURE) or getPromotion(move)]
+        self.orderer.orderMoves(position, allMoves)
+        bestScore = standPat if not evasions else -INFINITE_SCORE
+        for move in allMoves:
+            if not evasions:
+                # Delta pruning: skip captures that cannot bring the score back into the window
+                flags = getMoveFlags(move)
+                victim = PAWN if flags & EN_PASSANT else \
+                         getPieceType(position.pieceAt(getToSquare(move)))
+                gain = (PIECE_VALUES[victim] if flags & CAPTURE else 0) + \
+                       PIECE_VALUES[getPromotion(move)] + DELTA_MARGIN
+                if standPat + gain <= alpha: continue
+            position.makeMove(move)
+            score = -self.quiescence(position, -beta, -alpha, ply+1, qDepth+1)
+            position.unmakeMove()
+            if score > bestScore:
+                bestScore = score
+                alpha = max(alpha, score)
+                if alpha >= beta: break
+        return bestScore
+    def getReduction(self, index, depth):
+        # Late move reductions: moves ordered this late rarely beat alpha
+        return min(1 if index < LMR_LATE_MOVES else 2, depth-2)
+    def searchMove(self, position, depth, ply, alpha, beta, index, reduction=0, childPv=None):
+        # Score of the move just made, searched as move number index of its node
+        if index == 0: return -self.negamax(position, depth-1, ply+1, -beta, -alpha, childPv)
+        score = -self.negamax(position, depth-1-reduction, ply+1, -alpha-1, -alpha)
+        # A reduced move that beats alpha gets a full depth search after all
+        if (reduction > 0) and (score > alpha):
+            score = -self.negamax(position, depth-1, ply+1, -alpha-1, -alpha)
+        # Only PV nodes have room between alpha and beta for a re-search
+        if alpha < score < beta:
+            score = -self.negamax(position, depth-1, ply+1, -beta, -alpha, childPv)
+        return score
+    def negamax(self, position, depth, ply, alpha, beta, pv=None):
+        # Principal variation search: scores are from the side to move. The first
+        # move gets the full window, the rest a null window that is only widened
+        # when a move turns out better. PV nodes pass a list to fill with their
+        # principal variation; null window nodes pass None.
+        self.countNode()
+        isPvNode = beta - alpha > 1
+        hashMove = NO_MOVE
+        entry = self.table.probe(position.key)
+        if entry != None:
+            hashMove = entry[MOVE]
+            # PV nodes always search so the principal variation stays complete
+            if (not isPvNode) and (entry[DEPTH] >= depth):
+                score = scoreFromTable(entry[SCORE], ply)
+                if (entry[BOUND] == EXACT) or \
+                   ((entry[BOUND] == LOWER_BOUND) and (score >= beta)) or \
+                   ((entry[BOUND] == UPPER_BOUND) and (score <= alpha)):
+                        return score
+        if (ply > 0) and (self.tablebase != None):
+            score = self.tablebase.getScore(position, ply)
+            if score != None: return SIDE_SIGNS[position.sideToMove] * score
+        if depth <= 0:
+            self.quiescenceNodes = 0
+            return self.quiescence(position, alpha, beta, ply, 0)
+        inCheck = isInCheck(position)
+        # Selective search is left out where a wrong guess would cost the principal
+        # variation, an escape from check or a mate score
+        canPrune = (not isPvNode) and (not inCheck) and (ply > 0) and (abs(beta) < MATE_BOUND)
+        staticEval = SIDE_SIGNS[position.sideToMove] * evaluate(position) if canPrune else 0
+        # Reverse futility: so far above beta that a shallow search will not fall below it
+        if canPrune and self.futility and (depth <= FUTILITY_DEPTH) and \
+           (staticEval - REVERSE_FUTILITY_MARGIN * depth >= beta):
+                return staticEval
+        # Null move: if passing the turn still fails high, a real move will too. Not
+        # with only pawns left, where zugzwang makes passing the best move, and
+        # never twice in a row
+        if canPrune and self.nullMove and (depth >= NULL_MOVE_MIN_DEPTH) and \
+           (staticEval >= beta) and (position.history[-1][0] != NO_MOVE) and \
+           hasPieces(position, position.sideToMove):
+            reduction = NULL_MOVE_REDUCTION + (1 if depth > NULL_MOVE_DEEP else 0)
+            position.makeNullMove()
+            score = -self.negamax(position, depth-1-reduction, ply+1, -beta, -beta+1)
+            position.unmakeMove()
+            if score >= beta: return beta if score > MATE_BOUND else score
+        allLegalMoves = getLegalMoves(position)
+        # No legal moves: checkmate or stalemate
+        if len(allLegalMoves) == 0:
+            return getTerminalScore(inCheck, ply)
+        # Root moves the orderer scores equally are tried in random order
+        if ply == 0: self.random.shuffle(allLegalMoves)
+        self.orderer.orderMoves(position, allLegalMoves, hashMove, ply)
+        # Futility: near the leaves, quiet moves cannot lift a hopeless score to alpha
+        futilityPrune = canPrune and self.futility and (depth <= FUTILITY_DEPTH) and \
+                        (staticEval + FUTILITY_MARGINS[depth] <= alpha)
+        reduceLateMoves = self.lateMoveReductions and (not inCheck) and (depth >= LMR_MIN_DEPTH)
+        alphaOriginal = alpha
+        bestScore = -INFINITE_SCORE
+        bestMove = NO_MOVE
+        for index, move in enumerate(allLegalMoves):
+            childPv = list() if isPvNode else None
+            quiet = self.orderer.isQuiet(move)
+            position.makeMove(move)
+            reduction = 0
+            # Only quiet moves that do not give check are pruned or reduced
+            if (index > 0) and quiet and (futilityPrune or (reduceLateMoves and index >= LMR_MIN_MOVES)) \
+               and (not isInCheck(position)):
+                if futilityPrune:
+                    position.unmakeMove()
+                    bestScore = max(bestScore, staticEval + FUTILITY_MARGINS[depth])
+                    continue
+                reduction = self.getReduction(index, depth)
+            score = self.searchMove(position, depth, ply, alpha, beta, index, reduction, childPv)
+            position.unmakeMove()
+            if score > bestScore:
+                bestScore = score
+                bestMove = move
+                if score > alpha:
+                    alpha = score
+                    if pv != None: pv[:] = [move] + childPv
+                    if alpha >= beta:
+                        self.orderer.recordCutoff(position, move, depth, ply)
+                        break
+        if bestScore <= alphaOriginal: bound = UPPER_BOUND
+        elif bestScore >= beta: bound = LOWER_BOUND
+        else: bound = EXACT
+        self.table.store(position.key, depth, scoreToTable(bestScore, ply), bound, bestMove)
+        return bestScore
@@ -0,0 +1,101 @@
+# chess [ai] engine
+# Syzygy endgame tablebase probing through the optional python-chess package
+
+import collections
+import importlib.util
+import os
+from engine.position import BLACK, CAPTURE, PAWN, getFromSquare, getMoveFlags, getPieceType
+from engine.movegen import getLegalMoves, isInCheck
+from engine.bitboard import popCount
+from engine.evaluate import MATE_BOUND
+
+# python-chess is imported by the first Tablebase, not with the engine
+SYZYGY_AVAILABLE = importlib.util.find_spec("chess") != None
+
+# Tablebase wins score below any mate found by the search, less the distance
+# from the root so that shorter wins are preferred
+TB_WIN_SCORE  = MATE_BOUND - 100
+# Probes remembered by position key (least recently used are dropped first)
+TB_CACHE_SIZE = 65536
+
+# WDL values from the side to move: loss, blessed loss, draw, cursed win, win.
+# Cursed wins and blessed losses are draws under the fifty move rule.
+WDL_SCORES = {-2: -TB_WIN_SCORE, -1: -1, 0: 0, 1: 1, 2: TB_WIN_SCORE}
+
+class Tablebase(object):
+    def __init__(self, directory, cacheSize=TB_CACHE_SIZE):
+        if not SYZYGY_AVAILABLE: raise ImportError("Syzygy probing needs the python-chess package")
+        import chess
+        import chess.syzygy
+        self.board = chess.Board
+        self.directory = directory
+        self.tables = chess.syzygy.open_tablebase(directory)
+        # Largest table in the directory, e.g. "KRPvKR.rtbw" holds five pieces
+        self.maxPieces = max([len(os.path.splitext(fileName)[0]) - 1
+                              for fileName in os.listdir(directory)
+                              if fileName.endswith(".rtbw")] + [0])
+        self.cacheSize = cacheSize
+        self.wdlCache = collections.OrderedDict()
+        self.dtzCache = collections.OrderedDict()
+        self.probes = 0
+        self.hits = 0
+    def close(self):
+        self.tables.close()
+    def canProbe(self, position):
+        # Tables do not cover positions where castling is still possible
+        return (position.castling == 0) and (popCount(position.occupied) <= self.maxPieces)
+    def probe(self, cache, probeBoard, position):
+        self.probes += 1
+        if position.key in cache:
+            self.hits += 1
+            cache.move_to_end(position.key)
+            return cache[position.key]
+        value = probeBoard(self.board(position.toFen()), None)
+        cache[position.key] = value
+        if len(cache) > self.cacheSize: cache.popitem(last=False)
+        return value
+    def probeWdl(self, position):
+        # -2 (loss) to 2 (win) for the side to move, or None if no table has it
+        if not self.canProbe(position): return None
+        return self.probe(self.wdlCache, self.tables.get_wdl, position)
+    def probeDtz(self, position):
+        # Plies to the next capture or pawn move with best play, negative when
+        # losing, or None if no table has it
+        if not self.canProbe(position): return None
+        return self.probe(self.dtzCache, self.tables.get_dtz, position)
+    def getScore(self, position, ply):
+        # Search score (white positive) of a tablebase position, or None
+        wdl = self.probeWdl(position)
+        if wdl == None: return None
+        score = WDL_SCORES[wdl]
+        if wdl == 2: score -= ply
+        elif wdl == -2: score += ply
+        return -score if position.sideToMove == BLACK else score
+    def getRootMove(self, position):
+        # The move that keeps the best result and, when winning, reaches the next
+        # capture or pawn move soonest; returns None if any move is not in the tables
+        if not self.canProbe(position): return None
+        bestMove = None
+        bestRank = None
+        for move in getLegalMoves(position):
+            zeroing = (getMoveFlags(move) & CAPTURE) or \
+                      (getPieceType(position.pieceAt(getFromSquare(move))) == PAWN)
+            position.makeMove(move)
+            if len(getLegalMoves(position)) == 0:
+                wdl = 2 if isInCheck(position) else 0
+                dtz = 0
+            else:
+                childWdl = self.probeWdl(position)
+                childDtz = self.probeDtz(position)
+                wdl = None if childWdl == None else -childWdl
+                dtz = None if childDtz == None else abs(childDtz)
+            position.unmakeMove()
+            if (wdl == None) or (dtz == None): return None
+            # Winning: zeroing moves first, then the shortest distance to zeroing;
+            # losing: the longest
+            if wdl > 0: rank = (wdl, 1 if zeroing or dtz == 0 else 0, -dtz)
+            else: rank = (wdl, 0, dtz)
+            if (bestRank == None) or (rank > bestRank):
+                bestMove = move
+                bestRank = rank
+        return bestMove
@@ -0,0 +1,48 @@
+# chess [ai] engine
+# Transposition table keyed by Zobrist keys
+
+EXACT       = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Entries are tuples (key, depth, score, bound, move, generation)
+KEY        = 0
+DEPTH      = 1
+SCORE      = 2
+BOUND      = 3
+MOVE       = 4
+GENERATION = 5
+
+# Rough memory cost of one slot (list pointer, entry tuple and its ints)
+SLOT_BYTES = 160
+
+class TranspositionTable(object):
+    def __init__(self, sizeMb=16):
+        self.resize(sizeMb)
+    def resize(self, sizeMb):
+        # Each bucket has a depth-preferred slot followed by an always-replace slot
+        buckets = max(1, (sizeMb * 1024 * 1024) // (2 * SLOT_BYTES))
+        self.bucketMask = (1 << (buckets.bit_length() - 1)) - 1
+        self.clear()
+    def clear(self):
+        self.entries = [None] * (2 * (self.bucketMask + 1))
+        self.generation = 0
+    def newSearch(self):
+        # Entries from earlier searches may be replaced regardless of depth
+        self.generation += 1
+    def probe(self, key):
+        index = (key & self.bucketMask) << 1
+        entry = self.entries[index]
+        if (entry != None) and (entry[KEY] == key): return entry
+        entry = self.entries[index+1]
+        if (entry != None) and (entry[KEY] == key): return entry
+        return None
+    def store(self, key, depth, score, bound, move):
+        index = (key & self.bucketMask) << 1
+        deepEntry = self.entries[index]
+        entry = (key, depth, score, bound, move, self.generation)
+        if (deepEntry == None) or (deepEntry[KEY] == key) or (depth >= deepEntry[DEPTH]) or \
+           (deepEntry[GENERATION] != self.generation):
+            self.entries[index] = entry
+        else:
+            self.entries[index+1] = entry
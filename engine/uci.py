@@ -0,0 +1,213 @@
+# chess [ai] engine
+# Universal Chess Interface front end: python -m engine.uci
+
+import sys
+import threading
+import time
+from engine.position import Position, WHITE, COLOR_NAMES, START_FEN, NO_MOVE, moveToUci
+from engine.movegen import getMoveFromUci
+from engine.evaluate import MATE_SCORE, MATE_BOUND
+from engine.search import MinimaxAgent, MAX_SEARCH_DEPTH
+from engine.parallel import ParallelAgent
+from engine.book import OpeningBook
+from engine.tablebase import Tablebase
+
+ENGINE_NAME   = "chess [ai]"
+ENGINE_AUTHOR = "Florian Cords"
+
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB     = 1024
+# Search processes; more than one splits the root moves between them
+MAX_THREADS     = 64
+
+# Time control: moves left when the GUI does not say, and a safety margin for
+# move overhead (milliseconds)
+DEFAULT_MOVES_TO_GO = 30
+MOVE_OVERHEAD       = 50
+MIN_MOVE_TIME       = 10
+
+GO_PARAMETERS = ["depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo"]
+
+def getUciScore(score, sideToMove):
+    # Search scores are white positive; UCI scores are from the side to move
+    if sideToMove != WHITE: score = -score
+    if score > MATE_BOUND: return f"mate {(MATE_SCORE - score + 1) // 2}"
+    if score < -MATE_BOUND: return f"mate -{(MATE_SCORE + score + 1) // 2}"
+    return f"cp {score}"
+
+def getGoParameters(tokens):
+    parameters = dict()
+    for index, token in enumerate(tokens):
+        if (token in GO_PARAMETERS) and (index+1 < len(tokens)):
+            try: parameters[token] = int(tokens[index+1])
+            except ValueError: pass
+        elif token == "infinite":
+            parameters[token] = True
+    return parameters
+
+def getMoveTime(parameters, sideToMove):
+    # Milliseconds for this move, or None to search until depth or "stop"
+    if "movetime" in parameters: return max(MIN_MOVE_TIME, parameters["movetime"] - MOVE_OVERHEAD)
+    side = "w" if sideToMove == WHITE else "b"
+    if (parameters.get("infinite")) or (side + "time" not in parameters): return None
+    timeLeft = parameters[side + "time"]
+    increment = parameters.get(side + "inc", 0)
+    movesToGo = max(1, parameters.get("movestogo", DEFAULT_MOVES_TO_GO))
+    budget = timeLeft // movesToGo + increment * 3 // 4
+    return max(MIN_MOVE_TIME, min(budget, timeLeft // 2) - MOVE_OVERHEAD)
+
+class UciEngine(object):
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.outputLock = threading.Lock()
+        self.hashSizeMb = DEFAULT_HASH_MB
+        self.threads = 1
+        self.book = None
+        self.tablebase = None
+        self.agent = None
+        self.position = Position.startPosition()
+        self.searchThread = None
+        self.newGame()
+    def send(self, line):
+        with self.outputLock:
+            self.output.write(line + "\n")
+            self.output.flush()
+    def newGame(self):
+        self.closeAgent()
+        if self.threads > 1:
+            self.agent = ParallelAgent(MAX_SEARCH_DEPTH, COLOR_NAMES[WHITE], self.hashSizeMb,
+                                       workers=self.threads)
+        else:
+            self.agent = MinimaxAgent(MAX_SEARCH_DEPTH, COLOR_NAMES[WHITE], self.hashSizeMb)
+        self.agent.book = self.book
+        self.agent.tablebase = self.tablebase
+        # Workers start here, between commands, rather than in the search thread
+        if isinstance(self.agent, ParallelAgent): self.agent.startPool()
+    def closeAgent(self):
+        if isinstance(self.agent, ParallelAgent): self.agent.close()
+    def handleCommand(self, line):
+        # Returns False once the engine should exit
+        tokens = line.split()
+        if len(tokens) == 0: return True
+        command = tokens[0]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name SyzygyPath type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.setOption(tokens[1:])
+        elif command == "ucinewgame":
+            self.waitForSearch()
+            self.newGame()
+        elif command == "position":
+            self.waitForSearch()
+            self.setPosition(tokens[1:])
+        elif command == "go":
+            self.waitForSearch()
+            self.startSearch(getGoParameters(tokens[1:]))
+        elif command == "stop":
+            self.stopSearch()
+        elif command == "quit":
+            self.stopSearch()
+            return False
+        return True
+    def setOption(self, tokens):
+        # setoption name <name> value <value>
+        if ("name" not in tokens) or ("value" not in tokens): return
+        name = " ".join(tokens[tokens.index("name")+1:tokens.index("value")])
+        value = " ".join(tokens[tokens.index("value")+1:])
+        if (name.lower() == "hash") and value.isdigit():
+            self.waitForSearch()
+            self.hashSizeMb = max(1, min(MAX_HASH_MB, int(value)))
+            self.agent.setHashSize(self.hashSizeMb)
+        elif (name.lower() == "threads") and value.isdigit():
+            self.waitForSearch()
+            self.threads = max(1, min(MAX_THREADS, int(value)))
+            self.newGame()
+        elif name.lower() == "bookfile":
+            self.waitForSearch()
+            self.setBook(value)
+        elif name.lower() == "syzygypath":
+            self.waitForSearch()
+            self.setTablebase(value)
+    def setBook(self, fileName):
+        if self.book != None: self.book.close()
+        self.book = None
+        if fileName not in ("", "<empty>"):
+            try:
+                self.book = OpeningBook(fileName)
+            except OSError:
+                self.send(f"info string cannot open book: {fileName}")
+        self.agent.book = self.book
+    def setTablebase(self, directory):
+        if self.tablebase != None: self.tablebase.close()
+        self.tablebase = None
+        if directory not in ("", "<empty>"):
+            try:
+                self.tablebase = Tablebase(directory)
+            except (ImportError, OSError) as error:
+                self.send(f"info string cannot use tablebases: {error}")
+        # Parallel workers open the tables when their pool starts
+        self.newGame()
+    def setPosition(self, tokens):
+        # position startpos|fen <fen> [moves <move> ...]
+        movesIndex = tokens.index("moves") if "moves" in tokens else len(tokens)
+        if (len(tokens) > 0) and (tokens[0] == "fen"):
+            fen = " ".join(tokens[1:movesIndex])
+        else:
+            fen = START_FEN
+        try:
+            position = Position.fromFen(fen)
+        except ValueError:
+            self.send(f"info string invalid position: {fen}")
+            return
+        for uci in tokens[movesIndex+1:]:
+            move = getMoveFromUci(position, uci)
+            if move == NO_MOVE:
+                self.send(f"info string illegal move: {uci}")
+                break
+            position.makeMove(move)
+        self.position = position
+    def startSearch(self, parameters):
+        maxDepth = parameters.get("depth", MAX_SEARCH_DEPTH)
+        timeMs = getMoveTime(parameters, self.position.sideToMove)
+        # The search makes and unmakes moves, so it gets its own copy
+        position = self.position.copy()
+        self.searchThread = threading.Thread(target=self.search,
+                                             args=(position, timeMs, maxDepth))
+        self.searchThread.daemon = True
+        self.searchThread.start()
+    def search(self, position, timeMs, maxDepth):
+        bestMove = self.agent.search(position, timeMs, maxDepth, self.sendInfo)
+        self.send(f"bestmove {moveToUci(bestMove) if bestMove != NO_MOVE else '0000'}")
+    def sendInfo(self, depth, score, pv):
+        elapsedMs = max(1, int((time.time() - self.agent.startTime) * 1000))
+        nodes = self.agent.nodes
+        self.send(f"info depth {depth} score {getUciScore(score, self.position.sideToMove)} "
+                  f"nodes {nodes} nps {nodes * 1000 // elapsedMs} time {elapsedMs} "
+                  f"pv {' '.join(moveToUci(move) for move in pv)}")
+    def stopSearch(self):
+        if self.searchThread != None: self.agent.stopped = True
+        self.waitForSearch()
+    def waitForSearch(self):
+        # Commands that change the engine state wait for bestmove first
+        if self.searchThread != None:
+            self.searchThread.join()
+            self.searchThread = None
+            self.agent.stopped = False
+
+def main():
+    engine = UciEngine()
+    for line in sys.stdin:
+        if not engine.handleCommand(line): break
+    engine.stopSearch()
+    engine.closeAgent()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# chess [ai] engine
+# Zobrist hashing keys
+
+import random
+
+# Fixed seed so a position hashes to the same key on every run
+zobristRandom = random.Random(15112)
+
+def getRandomKey():
+    return zobristRandom.getrandbits(64)
+
+# Indexed by piece code (16 codes) and square (64 squares)
+PIECE_KEYS    = [[getRandomKey() for square in range(64)] for piece in range(16)]
+CASTLING_KEYS = [getRandomKey() for rights in range(16)]
+EP_FILE_KEYS  = [getRandomKey() for col in range(8)]
+SIDE_KEY      = getRandomKey()
+
+def getPositionKey(position):
+    key = 0
+    for square, piece in enumerate(position.squares):
+        if piece: key ^= PIECE_KEYS[piece][square]
+    key ^= CASTLING_KEYS[position.castling]
+    if position.epSquare >= 0: key ^= EP_FILE_KEYS[position.epSquare & 7]
+    if position.sideToMove: key ^= SIDE_KEY
+    return key